@@ -0,0 +1,88 @@
+"""
+Compare the sync (threadpool) and async (aiosqlite) database paths of main.py.
+
+Starts the API once per VILLA_DB_MODE against a fresh SQLite file seeded with
+--rows villas, fires --requests single-villa and page reads at --concurrency
+and prints throughput and latency percentiles for each mode as JSON.
+
+    python benchmarks/async_vs_sync.py --rows 10000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from harness import seed, start_server, stop_server, summarize, wait_until_up
+
+
+async def drive(base_url, rows, total, concurrency):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                if i % 2:
+                    url = f"/api/VillaAPI/{random.randint(1, rows)}"
+                else:
+                    url = f"/api/VillaAPI?limit=50&after_id={random.randint(0, rows)}"
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+def run_mode(mode, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "villas.db")
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(db_path, args.port, VILLA_DB_MODE=mode)
+        try:
+            wait_until_up(base_url)
+            seed(db_path, args.rows)
+            return asyncio.run(
+                drive(base_url, args.rows, args.requests, args.concurrency)
+            )
+        finally:
+            stop_server(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=7199)
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args) for mode in ("sync", "async")}
+    results["config"] = vars(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
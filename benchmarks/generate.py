@@ -0,0 +1,297 @@
+"""
+Write synthetic villas straight into the `villas` table of a SQLite file.
+
+Rate, sqft and occupancy are drawn from configurable distributions, and the
+text columns get realistic, varied lengths. Rows are inserted with
+executemany in one transaction. Secondary indexes and the search triggers
+are dropped for the load and rebuilt once at the end, so a million rows take
+seconds rather than minutes.
+
+    python benchmarks/generate.py villas.db --rows 1000000
+    python benchmarks/generate.py big.db --rows 200000 --rate normal:300,80 \\
+        --occupancy choice:2,4,4,6,8 --seed 7
+
+If the file has no `villas` table yet, main.py is imported once against it to
+create the schema, indexes and search table. Point the API (and through it
+the GUI) at the result with VILLA_DATABASE_URL=sqlite:///big.db.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RATE = "lognormal:5.5,0.6"  # median ~245, long tail of luxury villas
+DEFAULT_SQFT = "normal:2200,900"
+DEFAULT_OCCUPANCY = "choice:2,2,4,4,4,6,6,8,10,12"
+# Inclusive bounds every generated value is clipped to
+BOUNDS = {"rate": (10, 20000), "sqft": (150, 20000), "occupancy": (1, 30)}
+
+ADJECTIVES = (
+    "Azure", "Golden", "Hidden", "Royal", "Quiet", "Coral", "Misty", "Sunny",
+    "Olive", "Silver", "Palm", "Cedar", "Ivory", "Amber", "Emerald", "Rustic",
+)  # fmt: skip
+PLACES = (
+    "Bay", "Cove", "Ridge", "Lagoon", "Garden", "Harbor", "Valley", "Cliff",
+    "Dunes", "Grove", "Springs", "Point", "Meadow", "Reef", "Terrace", "Summit",
+)  # fmt: skip
+WORDS = (
+    "spacious villa with panoramic views over the sea and private terrace "
+    "bright open plan living area fully equipped kitchen and dining room "
+    "quiet neighbourhood close to the beach restaurants and local markets "
+    "master bedroom with ensuite bathroom walk in wardrobe and balcony "
+    "landscaped garden shaded pergola outdoor shower and barbecue area "
+    "ideal for families and groups traditional stone architecture modern "
+    "comfort air conditioning throughout daily housekeeping on request"
+).split()
+AMENITIES = (
+    "Pool", "WiFi", "Parking", "Kitchen", "Air conditioning", "Gym", "Sauna",
+    "Hot tub", "Garden", "BBQ", "Sea view", "Washer", "Dryer", "Fireplace",
+    "Pet friendly", "EV charger", "Workspace", "Beach access", "Tennis court",
+    "Game room", "Home theater", "Crib", "Breakfast included", "Airport shuttle",
+)  # fmt: skip
+# Distinct text values generated up front and sampled per row; building text
+# for every row would dominate the run time
+TEXT_POOL_SIZE = 4096
+
+
+def parse_distribution(spec, rng=random, bounds=(-math.inf, math.inf)):
+    """Turn e.g. 'normal:2200,900' into a sampler drawing from `rng`.
+
+    Supported: uniform:LOW,HIGH  normal:MEAN,SD  lognormal:MU,SIGMA
+    (of the natural log)  choice:V1,V2,...  (repeat values to weight them).
+    Samples are clipped to `bounds`.
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad distribution parameters: {spec!r}")
+    if kind == "uniform" and len(values) == 2:
+        low, high = values
+        draw = lambda: rng.uniform(low, high)  # noqa: E731
+    elif kind == "normal" and len(values) == 2:
+        mean, sd = values
+        draw = lambda: rng.gauss(mean, sd)  # noqa: E731
+    elif kind == "lognormal" and len(values) == 2:
+        mu, sigma = values
+        draw = lambda: rng.lognormvariate(mu, sigma)  # noqa: E731
+    elif kind == "choice" and values:
+        count = len(values)
+        draw = lambda: values[int(rng.random() * count)]  # noqa: E731
+    else:
+        raise argparse.ArgumentTypeError(f"unknown distribution: {spec!r}")
+
+    low, high = bounds
+
+    def sample():
+        value = draw()
+        return low if value < low else high if value > high else value
+
+    return sample
+
+
+def text_pool(rng, size, min_words, max_words):
+    # Word counts are skewed towards the short end, like real listings
+    pool = []
+    for _ in range(size):
+        count = min_words + int((max_words - min_words) * rng.random() ** 2)
+        words = rng.choices(WORDS, k=count)
+        pool.append(" ".join(words).capitalize() + ".")
+    return pool
+
+
+def amenity_pool(rng, size):
+    return [", ".join(rng.sample(AMENITIES, rng.randint(2, 10))) for _ in range(size)]
+
+
+def villa_rows(rows, rng, rate, sqft, occupancy):
+    """Yield `rows` villa tuples; rate, sqft and occupancy are samplers."""
+    details = text_pool(rng, TEXT_POOL_SIZE, 12, 120)
+    amenities = amenity_pool(rng, TEXT_POOL_SIZE)
+    names = [f"{adjective} {place}" for adjective in ADJECTIVES for place in PLACES]
+    # Creation times (unix seconds) spread over the last two years, oldest
+    # first; SQLite formats them, which is much cheaper than datetime here
+    end = time.time()
+    start = end - 730 * 86400
+    step = (end - start) / max(rows, 1)
+    # Sampling is the bottleneck, so skip randrange() and its checks
+    random_ = rng.random
+    name_count = len(names)
+    for i in range(1, rows + 1):
+        yield (
+            f"{names[int(random_() * name_count)]} Villa {i}",
+            details[int(random_() * TEXT_POOL_SIZE)],
+            round(rate(), 2),
+            int(sqft()),
+            int(occupancy()),
+            f"https://images.example.com/villas/{i}.jpg",
+            amenities[int(random_() * TEXT_POOL_SIZE)],
+            start + i * step,
+        )
+
+
+def ensure_schema(db_path):
+    """Create the app's schema in `db_path` by importing main.py against it."""
+    # Closed right away: an open connection keeps a WAL database from
+    # switching to the load's journal mode
+    with closing(sqlite3.connect(db_path)) as conn:
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'villas'"
+        ).fetchone():
+            return
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run(
+            [sys.executable, "-c", "import main"],
+            cwd=workdir,  # main.py creates logs/ in its working directory
+            env=dict(
+                os.environ,
+                PYTHONPATH=REPO_DIR,
+                VILLA_DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}",
+            ),
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+def generate(
+    db_path,
+    rows,
+    seed=1,
+    rate=DEFAULT_RATE,
+    sqft=DEFAULT_SQFT,
+    occupancy=DEFAULT_OCCUPANCY,
+    batch_size=50000,
+    search_index=True,
+):
+    """Append `rows` villas to `db_path` and return the seconds it took.
+
+    With `search_index=False` the full-text index is left stale; run
+    `python main.py rebuild-search` against the file before searching it.
+    """
+    started = time.perf_counter()
+    ensure_schema(db_path)
+    rng = random.Random(seed)
+    generated = villa_rows(
+        rows,
+        rng,
+        parse_distribution(rate, rng, BOUNDS["rate"]),
+        parse_distribution(sqft, rng, BOUNDS["sqft"]),
+        parse_distribution(occupancy, rng, BOUNDS["occupancy"]),
+    )
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # The load either completes or is rolled back as a whole, so the
+        # rollback journal can live in memory and syncs can be skipped
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+        conn.execute("BEGIN")
+        deferred = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master"
+            " WHERE tbl_name = 'villas' AND type IN ('index', 'trigger')"
+            " AND sql IS NOT NULL"
+        ).fetchall()
+        for kind, name, _ in deferred:
+            conn.execute(f'DROP {kind.upper()} "{name}"')
+        (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM villas").fetchone()
+
+        while True:
+            batch = [row for _, row in zip(range(batch_size), generated)]
+            if not batch:
+                break
+            conn.executemany(
+                "INSERT INTO villas (name, details, rate, sqft, occupancy, imageUrl,"
+                " amenity, createdDate, updatedDate) VALUES (?, ?, ?, ?, ?, ?, ?,"
+                " datetime(?8, 'unixepoch'), datetime(?8, 'unixepoch'))",
+                batch,
+            )
+
+        for _, _, sql in deferred:
+            conn.execute(sql)
+        has_search = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'villas_fts'"
+        ).fetchone()
+        if has_search and search_index:
+            conn.execute("INSERT INTO villas_fts(villas_fts) VALUES ('rebuild')")
+        has_changes = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'villa_changes'"
+        ).fetchone()
+        if has_changes:
+            # What the change feed triggers would have recorded
+            conn.execute(
+                "INSERT OR REPLACE INTO villa_changes (villa_id, deleted)"
+                " SELECT id, 0 FROM villas WHERE id > ? ORDER BY id",
+                (last_id,),
+            )
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.strip().splitlines()[1:]),
+    )
+    parser.add_argument("database", help="SQLite file, created if missing")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate", default=DEFAULT_RATE, help="rate distribution")
+    parser.add_argument("--sqft", default=DEFAULT_SQFT, help="sqft distribution")
+    parser.add_argument(
+        "--occupancy", default=DEFAULT_OCCUPANCY, help="occupancy distribution"
+    )
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument(
+        "--no-search-index",
+        dest="search_index",
+        action="store_false",
+        help="skip re-indexing villas_fts (about half the run time at 1M rows)",
+    )
+    args = parser.parse_args()
+    for spec in (args.rate, args.sqft, args.occupancy):
+        try:
+            parse_distribution(spec)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+
+    seconds = generate(
+        args.database,
+        args.rows,
+        seed=args.seed,
+        rate=args.rate,
+        sqft=args.sqft,
+        occupancy=args.occupancy,
+        batch_size=args.batch_size,
+        search_index=args.search_index,
+    )
+    result = {
+        "database": args.database,
+        "rows": args.rows,
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(args.rows / seconds) if seconds else None,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
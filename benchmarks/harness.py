@@ -0,0 +1,112 @@
+"""
+Shared helpers for the benchmark scripts: seeding a SQLite file, running the
+API under uvicorn in a scratch directory and summarizing latencies.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+import httpx
+
+from generate import generate
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db_path, rows, seed=1):
+    """Fill `db_path` with `rows` synthetic villas, see generate.py."""
+    generate(db_path, rows, seed=seed)
+
+
+def start_server(db_path, port, **env):
+    """Run main:app on `port` against `db_path`; VILLA_* settings go in `env`."""
+    env = dict(os.environ, VILLA_DATABASE_URL=f"sqlite:///{db_path}", **env)
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--app-dir",
+            REPO_DIR,
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(db_path),  # keeps the logs/ folder out of the repo
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(server):
+    server.terminate()
+    server.wait()
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/VillaAPI?limit=1").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API at {base_url} did not come up")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and p50/p95/p99 latency (ms) of one run as a dict."""
+    latencies = sorted(latencies)
+
+    def ms(pct):
+        value = percentile(latencies, pct)
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(50),
+        "p95_ms": ms(95),
+        "p99_ms": ms(99),
+    }
+
+
+def database_locked_errors(base_url):
+    """`database is locked` failures the server has counted, from /metrics.
+
+    Returns None when the server runs with VILLA_METRICS=0.
+    """
+    response = httpx.get(f"{base_url}/metrics")
+    if response.status_code != 200:
+        return None
+    pattern = r'^villa_sql_errors_total\{[^}]*error="database_locked"[^}]*\} (\S+)$'
+    return sum(int(float(value)) for value in re.findall(pattern, response.text, re.M))
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,227 @@
+"""
+Load test every VillaAPI route of main.py and report the results as JSON.
+
+Seeds a SQLite file with --rows villas once, then for each scenario copies
+it, starts the API under uvicorn against the copy and sends --requests
+requests at --concurrency. Scenarios are the single routes (list, get,
+create, put, patch, delete) plus one mixed run per --mix weight spec. Each
+result has throughput, p50/p95/p99 latency and errors by status code, with
+"database is locked" failures read from the server's /metrics.
+
+    python benchmarks/load.py --rows 10000 --requests 5000 --concurrency 50
+    python benchmarks/load.py --scenario get --scenario mixed \\
+        --mix list=10,get=60,put=30 --env VILLA_DB_MODE=async -o run.json
+
+Runs use a fixed --seed, so the same request sequence is replayed across
+commits and their JSON outputs can be compared directly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from harness import (
+    database_locked_errors,
+    git_revision,
+    seed,
+    start_server,
+    stop_server,
+    summarize,
+    wait_until_up,
+)
+
+ROUTES = ("list", "get", "create", "put", "patch", "delete")
+DEFAULT_MIXES = (
+    "list=45,get=45,create=4,put=3,patch=3",
+    "list=25,get=25,create=20,put=15,patch=15",
+)
+
+
+def villa_body(rng):
+    number = rng.randint(1, 10**6)
+    return {
+        "name": f"Villa {number}",
+        "details": "Lorem ipsum dolor sit amet " * 8,
+        "rate": round(rng.uniform(50, 1000), 2),
+        "sqft": rng.randint(200, 5000),
+        "occupancy": rng.randint(1, 12),
+        "imageUrl": f"https://example.com/villa/{number}.jpg",
+        "amenity": "Pool, WiFi, Parking, Kitchen",
+    }
+
+
+def parse_mix(spec):
+    weights = {}
+    for item in spec.split(","):
+        route, _, weight = item.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route!r} in {spec!r}")
+        weights[route] = float(weight or 1)
+    return weights
+
+
+def plan_requests(weights, total, rows, rng):
+    """The (method, url, json body) sequence of one scenario.
+
+    Deletes take ids from a shuffled pool so no villa is deleted twice.
+    """
+    routes = rng.choices(list(weights), weights=list(weights.values()), k=total)
+    deletable = list(range(1, rows + 1))
+    rng.shuffle(deletable)
+    plan = []
+    for route in routes:
+        villa_id = rng.randint(1, rows)
+        if route == "list":
+            after_id = rng.randint(0, rows)
+            plan.append(("GET", f"/api/VillaAPI?limit=50&after_id={after_id}", None))
+        elif route == "get":
+            plan.append(("GET", f"/api/VillaAPI/{villa_id}", None))
+        elif route == "create":
+            plan.append(("POST", "/api/VillaAPI", villa_body(rng)))
+        elif route == "put":
+            plan.append(("PUT", f"/api/VillaAPI/{villa_id}", villa_body(rng)))
+        elif route == "patch":
+            rate = round(rng.uniform(50, 1000), 2)
+            patch = [{"op": "replace", "path": "/rate", "value": rate}]
+            plan.append(("PATCH", f"/api/VillaAPI/{villa_id}", patch))
+        elif deletable:
+            plan.append(("DELETE", f"/api/VillaAPI/{deletable.pop()}", None))
+    return plan
+
+
+async def drive(base_url, plan, concurrency):
+    latencies, statuses = [], Counter()
+    queue = asyncio.Queue()
+    for request in plan:
+        queue.put_nowait(request)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            while not queue.empty():
+                method, url, body = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=body)
+                    if response.status_code >= 400:
+                        statuses[str(response.status_code)] += 1
+                except httpx.HTTPError:
+                    statuses["transport"] += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, sum(statuses.values()), elapsed)
+    result["errors_by_status"] = dict(sorted(statuses.items()))
+    return result
+
+
+def run_scenario(name, weights, template_db, workdir, args):
+    db_path = os.path.join(workdir, name.replace(":", "_"), "villas.db")
+    os.makedirs(os.path.dirname(db_path))
+    shutil.copyfile(template_db, db_path)
+    rng = random.Random(f"{args.seed}:{name}")
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    server = start_server(db_path, args.port, **args.env)
+    try:
+        wait_until_up(base_url)
+        if args.warmup:
+            warmup = plan_requests({"get": 1, "list": 1}, args.warmup, args.rows, rng)
+            asyncio.run(drive(base_url, warmup, args.concurrency))
+        locked_before = database_locked_errors(base_url)
+        plan = plan_requests(weights, args.requests, args.rows, rng)
+        result = asyncio.run(drive(base_url, plan, args.concurrency))
+        locked_after = database_locked_errors(base_url)
+    finally:
+        stop_server(server)
+
+    result["database_locked"] = (
+        None if locked_before is None else locked_after - locked_before
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.strip().splitlines()[1:]),
+    )
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=ROUTES + ("mixed",),
+        help="route to run, or 'mixed' (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--mix",
+        action="append",
+        type=parse_mix,
+        help="route weights of a mixed run, e.g. list=45,get=45,put=10 (repeatable)",
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="extra server setting, e.g. VILLA_DB_MODE=async (repeatable)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=7199)
+    parser.add_argument("-o", "--output", help="write the JSON here, not stdout")
+    args = parser.parse_args()
+    args.env = dict(item.split("=", 1) for item in args.env)
+
+    scenarios = {}
+    for route in args.scenario or ROUTES + ("mixed",):
+        if route != "mixed":
+            scenarios[route] = {route: 1}
+            continue
+        for weights in args.mix or [parse_mix(spec) for spec in DEFAULT_MIXES]:
+            spec = ",".join(f"{name}={weight:g}" for name, weight in weights.items())
+            scenarios[f"mixed:{spec}"] = weights
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        template_db = os.path.join(workdir, "villas.db")
+        # Let the app create the schema and indexes, then fill the table
+        server = start_server(template_db, args.port, **args.env)
+        try:
+            wait_until_up(f"http://127.0.0.1:{args.port}")
+        finally:
+            stop_server(server)
+        seed(template_db, args.rows, seed=args.seed)
+
+        for name, weights in scenarios.items():
+            results[name] = run_scenario(name, weights, template_db, workdir, args)
+
+    report = {"revision": git_revision(), "config": vars(args), "results": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
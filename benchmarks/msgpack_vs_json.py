@@ -0,0 +1,85 @@
+"""
+Compare JSON and MessagePack for villa list payloads.
+
+Builds --rows villas shaped like GET /api/VillaAPI responses and reports the
+encoded size plus median encode/decode time of the stdlib json module, orjson
+(when installed) and msgpack, as JSON.
+
+    python benchmarks/msgpack_vs_json.py --rows 10000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+
+import msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_villas(rows):
+    now = datetime.utcnow().isoformat()
+    return [
+        {
+            "name": f"Villa {i}",
+            "details": "Lorem ipsum dolor sit amet " * 8,
+            "rate": round(random.uniform(50, 1000), 2),
+            "sqft": random.randint(200, 5000),
+            "occupancy": random.randint(1, 12),
+            "imageUrl": f"https://example.com/villa/{i}.jpg",
+            "amenity": "Pool, WiFi, Parking, Kitchen " * 4,
+            "id": i + 1,
+            "createdDate": now,
+            "updatedDate": now,
+        }
+        for i in range(rows)
+    ]
+
+
+def median_seconds(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    villas = make_villas(args.rows)
+    codecs = {
+        "json": (
+            lambda v: json.dumps(v, separators=(",", ":")).encode(),
+            json.loads,
+        ),
+        "msgpack": (msgpack.packb, msgpack.unpackb),
+    }
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+
+    results = {}
+    for name, (encode, decode) in codecs.items():
+        payload = encode(villas)
+        assert decode(payload) == villas
+        results[name] = {
+            "bytes": len(payload),
+            "encode_ms": round(median_seconds(encode, villas, args.repeat) * 1000, 2),
+            "decode_ms": round(median_seconds(decode, payload, args.repeat) * 1000, 2),
+        }
+    results["config"] = vars(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Time GET /api/VillaAPI with and without the fast JSON path of main.py.
+
+Seeds a temporary database with --rows villas, then serves the full list
+through FastAPI's TestClient, once through `response_model=List[Villa]`
+(VILLA_FAST_JSON off) and once from column rows encoded with orjson
+(VILLA_FAST_JSON on), and prints the median time per request as JSON. The
+list snapshot is off for both, since it would answer the second from stored
+bytes; a third run times those snapshot hits on their own.
+
+    python benchmarks/serialization.py --rows 10000 --repeat 10
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed_get(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return statistics.median(timings), response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)  # main.py writes logs/ relative to the working directory
+    os.environ["VILLA_DATABASE_URL"] = f"sqlite:///{workdir}/villas.db"
+    sys.path.insert(0, REPO_DIR)
+    warnings.simplefilter("ignore")
+
+    import logging
+
+    from fastapi.testclient import TestClient
+
+    import main as api
+
+    logging.disable(logging.INFO)
+    client = TestClient(api.app)
+    villas = [
+        {
+            "name": f"Villa {i}",
+            "details": "Lorem ipsum dolor sit amet " * 8,
+            "rate": round(random.uniform(50, 1000), 2),
+            "sqft": random.randint(200, 5000),
+            "occupancy": random.randint(1, 12),
+            "imageUrl": f"https://example.com/villa/{i}.jpg",
+            "amenity": "Pool, WiFi, Parking, Kitchen " * 4,
+        }
+        for i in range(args.rows)
+    ]
+    client.post("/api/VillaAPI/bulk", json=villas).raise_for_status()
+
+    results = {}
+    bodies = {}
+    cases = (
+        ("response_model", False, 0),
+        ("fast_json", True, 0),
+        ("snapshot", True, api.SNAPSHOT_MAX_BYTES),
+    )
+    for name, fast, snapshot_max_bytes in cases:
+        api.FAST_JSON = fast
+        api.SNAPSHOT_MAX_BYTES = snapshot_max_bytes
+        seconds, bodies[name] = timed_get(client, "/api/VillaAPI", args.repeat)
+        results[name] = {"median_ms": round(seconds * 1000, 2)}
+
+    results["speedup"] = round(
+        results["response_model"]["median_ms"] / results["fast_json"]["median_ms"], 2
+    )
+    outputs = [json.loads(body) for body in bodies.values()]
+    results["identical_output"] = all(output == outputs[0] for output in outputs)
+    results["orjson"] = api.orjson is not None
+    results["config"] = vars(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
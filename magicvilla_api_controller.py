@@ -22,6 +22,11 @@ import traceback
 
 import asyncio
 
+try:
+    import msgpack
+except ImportError:  # optional, JSON is used without it
+    msgpack = None
+
 global modified, data_loaded
 modified = False
 data_loaded = False
@@ -91,28 +96,123 @@ field_labels = {
 }
 
 numeric_fields = {"rate": "float", "sqft": "int", "occupancy": "int"}
+# Villa field behind each form label, e.g. "Image URL" -> "imageUrl"
+label_fields = {label: field for field, label in field_labels.items()}
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Send request bodies as MessagePack too (only the bundled FastAPI backend
+# understands them, the .NET MagicVilla API does not)
+send_msgpack = msgpack is not None and os.getenv("VILLA_SEND_MSGPACK") == "1"
+
+
+def accept_headers(headers):
+    """Ask for MessagePack when available; servers without it reply in JSON."""
+    if msgpack is not None:
+        headers["Accept"] = f"{MSGPACK_MEDIA_TYPE}, application/json;q=0.9"
+    return headers
+
+
+def decode_response(response):
+    if response.headers.get("Content-Type", "").startswith(MSGPACK_MEDIA_TYPE):
+        return msgpack.unpackb(response.content)
+    return response.json()
+
+
+def body_kwargs(headers, payload):
+    """requests keyword arguments sending payload as MessagePack or JSON."""
+    if send_msgpack:
+        headers["Content-Type"] = MSGPACK_MEDIA_TYPE
+        return {"data": msgpack.packb(payload)}
+    return {"json": payload}
+
+
+# Last villa list and its ETag, reused when the API answers 304 Not Modified
+villas_etag = None
+villas_result = None
+
+# Villas by id, kept current through the API's change feed, and the feed
+# cursor they are current as of. The .NET MagicVilla API has no feed.
+villas_by_id = {}
+villas_cursor = None
+change_feed_supported = True
+
+
+def sync_villas_through_api():
+    """Apply the changes since the last sync; False if the API has no feed."""
+    global villas_cursor, change_feed_supported
+
+    url = "http://localhost:7155/api/VillaAPI/changes"
+    headers = accept_headers({"cache-control": "no-cache"})
+    since = villas_cursor or 0
+
+    while True:
+        if since == 0:
+            villas_by_id.clear()
+        response = requests.request(
+            "GET", url, headers=headers, params={"since": since}, verify=False
+        )
+        if response.status_code == 410 and since:
+            logger.info("Change feed cursor is stale, reloading all villas")
+            since = 0
+            continue
+        if response.status_code != 200:
+            change_feed_supported = False
+            return False
+
+        page = decode_response(response)
+        for change in page["changes"]:
+            if change.get("deleted"):
+                villas_by_id.pop(change["id"], None)
+            else:
+                villas_by_id[change["id"]] = change
+        since = page["cursor"]
+        if not page["hasMore"]:
+            break
+
+    logger.info("Synced villas up to change %s", since)
+    villas_cursor = since
+    return True
 
 
 def get_villas_through_api():
+    global villas_etag, villas_result
+
+    if change_feed_supported:
+        try:
+            if sync_villas_through_api():
+                result = [villas_by_id[id] for id in sorted(villas_by_id)]
+                return {"result": result, "status": 200}
+        except Exception:
+            logger.exception("Change feed sync failed, loading the full list")
 
     url = "http://localhost:7155/api/VillaAPI"
 
     querystring = {}
 
-    headers = {"cache-control": "no-cache"}
+    headers = accept_headers({"cache-control": "no-cache"})
+    if villas_etag is not None:
+        headers["If-None-Match"] = villas_etag
 
     try:
         response = requests.request(
             "GET", url, headers=headers, params=querystring, verify=False
         )
         print(response)
-        print(response.text)
+        if response.status_code == 304:
+            logger.info("Villas not modified, using cached list")
+            return {"result": villas_result, "status": 200}
+
         if response.status_code == 200:
             logger.info("Obtaining Villas OK")
         else:
             logger.warning("Unhandled status code: %s", response.status_code)
 
-        result = response.json()
+        result = decode_response(response)
+        print(result)
+
+        if response.status_code == 200 and "ETag" in response.headers:
+            villas_etag = response.headers["ETag"]
+            villas_result = result
 
         return {"result": result, "status": response.status_code}
 
@@ -137,7 +237,11 @@ def create_villa_through_api(name, details, rate, sqft, occupancy, imageUrl, ame
 
     try:
         response = requests.request(
-            "POST", url, headers=headers, json=querystring, verify=False
+            "POST",
+            url,
+            headers=headers,
+            verify=False,
+            **body_kwargs(headers, querystring),
         )
 
         if response.status_code == 201:
@@ -172,7 +276,9 @@ def update_villa_through_api(
     headers = {"cache-control": "no-cache"}
 
     try:
-        response = requests.put(url, headers=headers, json=querystring, verify=False)
+        response = requests.put(
+            url, headers=headers, verify=False, **body_kwargs(headers, querystring)
+        )
 
         if response.status_code == 204:
             logger.info("Updating Villa OK")
@@ -192,7 +298,7 @@ def get_villa_through_api(id):
 
     querystring = {}
 
-    headers = {"cache-control": "no-cache"}
+    headers = accept_headers({"cache-control": "no-cache"})
 
     try:
         response = requests.request(
@@ -208,7 +314,7 @@ def get_villa_through_api(id):
         else:
             logger.warning("Unhandled status code: %s", response.status_code)
 
-        result = response.json()
+        result = decode_response(response)
 
         return {"result": result, "status": response.status_code}
 
@@ -249,8 +355,13 @@ def update_partial_villa_through_api(id, querystring):
     headers = {"Content-Type": "application/json", "cache-control": "no-cache"}
 
     try:
+        if send_msgpack:
+            headers["Content-Type"] = MSGPACK_MEDIA_TYPE
+            body = msgpack.packb(querystring)
+        else:
+            body = json.dumps(querystring)
         response = requests.request(
-            "PATCH", url, headers=headers, data=json.dumps(querystring), verify=False
+            "PATCH", url, headers=headers, data=body, verify=False
         )
 
         if response.status_code == 204:
@@ -1251,7 +1362,7 @@ def update_partial_villa():
                 queryparams.append(
                     {
                         "op": "replace",
-                        "path": f"/{label_text.lower()}",
+                        "path": f"/{label_fields[label_text]}",
                         "value": entry_text,
                     }
                 )
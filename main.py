@@ -1,49 +1,643 @@
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
-from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+from pydantic import BaseModel, ValidationError
+from typing import Any, List, Literal, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from sqlalchemy import (
+    Column,
+    event,
+    Integer,
+    String,
+    Float,
+    DateTime,
+    Index,
+    column,
+    and_,
+    create_engine,
+    delete,
+    false,
+    func,
+    insert,
+    literal_column,
+    select,
+    table,
+    text,
+    tuple_,
+    update,
+)
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import UnaryExpression
+from starlette.routing import Match
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from datetime import datetime, timezone
+from bisect import bisect_left
 import json
 
+import asyncio
+import atexit
+import contextvars
 import logging
+import math
+import operator
 import os
+import queue
+import base64
+import concurrent.futures
+import threading
+import time
+import uuid
+import zlib
 from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+try:
+    import orjson
+except ImportError:  # optional, the json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, without it the API only speaks JSON
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzip-compressed without it
+    brotli = None
 
 # --- Logging Setup ---
-os.makedirs("logs", exist_ok=True)
-
-# Log filename with today's date
-log_filename = datetime.now().strftime("logs/api_%Y-%m-%d.log")
-
-# Timed Rotating Handler: creates new file daily, keeps 7 days
-file_handler = TimedRotatingFileHandler(
-    filename=log_filename,
-    when="midnight",
-    interval=1,
-    backupCount=7,
-    encoding="utf-8",
-    utc=True,
-)
+# Set by serve.py in each worker process it starts. The launcher creates the
+# schema and writes the log file itself, so workers skip both.
+WORKER_ID = os.getenv("VILLA_WORKER_ID")
 
-file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
 
-# Console handler for terminal output
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(
-    logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
-)
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers (VILLA_LOG_FORMAT=json)."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() merges msg % args on the calling thread; the queue
+    never leaves this process, so the record can be handed over untouched.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def log_handlers():
+    """The handlers writing logs/api_YYYY-MM-DD.log and the terminal."""
+    os.makedirs("logs", exist_ok=True)
+
+    # Timed Rotating Handler: creates new file daily, keeps 7 days
+    file_handler = TimedRotatingFileHandler(
+        filename=datetime.now().strftime("logs/api_%Y-%m-%d.log"),
+        when="midnight",
+        interval=1,
+        backupCount=7,
+        encoding="utf-8",
+        utc=True,
+    )
+    # Console handler for terminal output
+    console_handler = logging.StreamHandler()
 
-# Apply both handlers to root logger
-logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
+    if os.getenv("VILLA_LOG_FORMAT", "text").lower() == "json":
+        log_formatter = JsonLogFormatter()
+    else:
+        log_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(log_formatter)
+    return file_handler, console_handler
+
+
+def setup_logging():
+    """Send the root logger's records through a queue to `log_handlers()`.
+
+    Request threads only enqueue records; a background listener thread does
+    the formatting and the (possibly slow) file and terminal writes.
+    """
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, *log_handlers(), respect_handler_level=True)
+    log_listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(log_listener.stop)
+    logging.basicConfig(level=logging.INFO, handlers=[DeferredQueueHandler(log_queue)])
+
+
+# Left alone when the host process configured logging first, as serve.py does
+# so that one process owns the rotating file
+if not logging.getLogger().handlers:
+    setup_logging()
 
 logger = logging.getLogger(__name__)
 
+# --- Content Negotiation ---
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Set per request by MessagePackMiddleware, read when responses are rendered
+use_msgpack = contextvars.ContextVar("use_msgpack", default=False)
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content):
+    """Compact JSON bytes, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), default=json_default).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response, or MessagePack with the same schema if the client asked."""
+
+    def __init__(self, content=None, *args, media_type=None, **kwargs):
+        if media_type is None and use_msgpack.get():
+            media_type = MSGPACK_MEDIA_TYPES[0]
+        super().__init__(content, *args, media_type=media_type, **kwargs)
+
+    def render(self, content):
+        if self.media_type in MSGPACK_MEDIA_TYPES:
+            return msgpack.packb(content, default=json_default)
+        return encode_json(content)
+
+
+class MessagePackMiddleware:
+    """Negotiates application/msgpack for request and response bodies.
+
+    `Accept: application/msgpack` makes FastJSONResponse encode with
+    MessagePack. MessagePack request bodies are turned into JSON before
+    FastAPI parses them, so routes and validation stay the same.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(MSGPACK_MEDIA_TYPES):
+            if msgpack is None:
+                response = JSONResponse(
+                    {"detail": "MessagePack is not supported"}, status_code=415
+                )
+                return await response(scope, receive, send)
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+            try:
+                body = encode_json(msgpack.unpackb(body))
+            except (ValueError, TypeError, msgpack.UnpackException):
+                response = JSONResponse(
+                    {"detail": "Body is not valid MessagePack"}, status_code=400
+                )
+                return await response(scope, receive, send)
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in (b"content-type", b"content-length")
+            ] + [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            pending = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive_transcoded():
+                return pending.pop() if pending else await receive()
+
+            receive = receive_transcoded
+
+        accept = headers.get("accept", "")
+        wants = msgpack is not None and any(t in accept for t in MSGPACK_MEDIA_TYPES)
+        token = use_msgpack.set(wants)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            use_msgpack.reset(token)
+
+
+# --- Compression ---
+# Bodies smaller than this are sent as is, compressing them isn't worth it
+COMPRESSION_MIN_SIZE = int(os.getenv("VILLA_COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("VILLA_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("VILLA_BROTLI_QUALITY", "4"))
+# Suffixes added to the ETag of compressed bodies, see not_modified()
+ENCODING_ETAG_SUFFIXES = ("-br", "-gzip")
+
+
+def offered_encodings(accept_encoding):
+    """Accept-Encoding as a {coding: quality} dict."""
+    offered = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    return offered
+
+
+def accepted_encoding(accept_encoding):
+    """Best encoding offered by the client: br (if available), gzip or None."""
+    offered = offered_encodings(accept_encoding)
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def revalidated_encoding(if_none_match, etag):
+    """Encoding of the compressed `etag` that If-None-Match names, if any."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in ENCODING_ETAG_SUFFIXES:
+            if tag == etag[:-1] + f'{suffix}"':
+                return suffix[1:]
+    return None
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated through Accept-Encoding.
+
+    Like Starlette's GZipMiddleware, but with brotli and per-chunk flushing so
+    streamed NDJSON still reaches the client row by row.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_headers = Headers(scope=scope)
+        encoding = accepted_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        compressor = None
+
+        def compress(data, final):
+            if encoding == "br":
+                chunk = compressor.process(data)
+                return chunk + (compressor.finish() if final else compressor.flush())
+            chunk = compressor.compress(data)
+            return chunk + compressor.flush(
+                zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+            )
+
+        def tag_encoding(headers, coding):
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                # A compressed body is a different representation
+                headers["ETag"] = headers["etag"][:-1] + f'-{coding}"'
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                return await send(message)
+
+            if compressor is None:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                headers = MutableHeaders(raw=start_message["headers"])
+                if "content-encoding" in headers or (
+                    not more_body and len(body) < COMPRESSION_MIN_SIZE
+                ):
+                    if start_message["status"] == 304 and "etag" in headers:
+                        # Revalidates a compressed 200, so it carries its tag
+                        cached = revalidated_encoding(
+                            request_headers.get("if-none-match", ""), headers["etag"]
+                        )
+                        tag_encoding(headers, cached or encoding)
+                    await send(start_message)
+                    start_message = None
+                    return await send(message)
+
+                if encoding == "br":
+                    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+                else:
+                    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+                headers["Content-Encoding"] = encoding
+                tag_encoding(headers, encoding)
+                body = compress(body, final=not more_body)
+                if more_body:
+                    del headers["content-length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                return await send(
+                    {"type": "http.response.body", "body": body, "more_body": more_body}
+                )
+
+            more_body = message.get("more_body", False)
+            body = compress(message.get("body", b""), final=not more_body)
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
+
+
+# --- Metrics ---
+# In-process Prometheus metrics served at GET /metrics; 0 turns them off
+METRICS_ENABLED = os.getenv("VILLA_METRICS", "1") == "1"
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Histogram bucket upper bounds, in seconds
+REQUEST_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)  # fmt: skip
+SQL_LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0
+)  # fmt: skip
+WRITE_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+SQL_STATEMENT_KINDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "CREATE")
+
+
+def metric_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms in Prometheus text format.
+
+    Series are keyed by metric name and a tuple of (label, value) pairs. A
+    metric has to be declared with `describe` before it is rendered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._metrics[name] = (kind, help_text, buckets)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._values[(name, labels)] = value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        buckets = self._metrics[name][2]
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            series[0][bisect_left(buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+            histograms = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._histograms.items()
+            )
+        lines = []
+        for name, (kind, help_text, buckets) in self._metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for (series, labels), value in values:
+                    if series == name:
+                        lines.append(f"{name}{metric_labels(labels)} {value}")
+                continue
+            for (series, labels), (counts, total) in histograms:
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), counts):
+                    cumulative += count
+                    bucket_labels = metric_labels(labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{metric_labels(labels)} {total}")
+                lines.append(f"{name}_count{metric_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe(
+    "villa_http_requests_total", "counter", "HTTP requests by route and status"
+)
+metrics.describe("villa_http_requests_in_flight", "gauge", "HTTP requests being served")
+metrics.describe(
+    "villa_http_request_duration_seconds",
+    "histogram",
+    "Time from receiving a request to sending its last body chunk",
+    REQUEST_LATENCY_BUCKETS,
+)
+metrics.describe(
+    "villa_sql_statement_duration_seconds",
+    "histogram",
+    "Time spent executing SQL statements on the DBAPI cursor",
+    SQL_LATENCY_BUCKETS,
+)
+metrics.describe(
+    "villa_sql_errors_total", "counter", "Failed SQL statements and commits"
+)
+metrics.describe(
+    "villa_sql_pool_connections_total", "counter", "DBAPI connections opened"
+)
+metrics.describe(
+    "villa_sql_pool_checkouts_total", "counter", "Connections checked out of the pool"
+)
+metrics.describe("villa_sql_pool_size", "gauge", "Configured pool size")
+metrics.describe("villa_sql_pool_checked_out", "gauge", "Connections currently in use")
+metrics.describe(
+    "villa_sql_pool_overflow", "gauge", "Connections open beyond the pool size"
+)
+metrics.describe("villa_cache_entries", "gauge", "Villas in the single-villa cache")
+metrics.describe("villa_cache_hits_total", "counter", "Single-villa cache hits")
+metrics.describe("villa_cache_misses_total", "counter", "Single-villa cache misses")
+metrics.describe(
+    "villa_write_batch_size",
+    "histogram",
+    "Writes committed together by the write queue",
+    WRITE_BATCH_BUCKETS,
+)
+
+
+def route_template(routes, scope):
+    """Path template of the route serving `scope`, to keep label sets bounded."""
+    for route in routes:
+        # Newer FastAPI versions keep included routers as a single entry
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            template = route_template(included.routes, scope)
+            if template is not None:
+                return template
+            continue
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return None
+
+
+class MetricsMiddleware:
+    """Records request counts, in-flight requests and latency per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = (("method", scope["method"]),)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.inc("villa_http_requests_in_flight", method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.inc("villa_http_requests_in_flight", method, -1)
+            # The router leaves the matched route in the scope; matching again
+            # is only needed for unrouted requests and rewritten scopes
+            route = scope.get("route")
+            if route is not None:
+                template = route.path
+            else:
+                template = route_template(scope["app"].routes, scope) or "unmatched"
+            labels = method + (("route", template),)
+            metrics.inc("villa_http_requests_total", labels + (("status", status),))
+            metrics.observe("villa_http_request_duration_seconds", labels, elapsed)
+
+
+def statement_kind(statement):
+    head = statement[:32].lstrip().upper()
+    for kind in SQL_STATEMENT_KINDS:
+        if head.startswith(kind):
+            return kind
+    return "OTHER"
+
+
+def instrument_engine(sync_engine, name):
+    """Time every statement and count pool activity of `sync_engine`."""
+    engine_label = ("engine", name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, params, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        labels = (engine_label, ("statement", statement_kind(statement)))
+        metrics.observe("villa_sql_statement_duration_seconds", labels, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # A failed COMMIT has no statement, so it has no start time to drop
+        if context.connection is not None and context.statement is not None:
+            starts = context.connection.info.get("query_start")
+            if starts:
+                starts.pop()
+        error = context.original_exception
+        kind = type(error).__name__
+        if "database is locked" in str(error):
+            kind = "database_locked"
+        metrics.inc("villa_sql_errors_total", (engine_label, ("error", kind)))
+
+    @event.listens_for(sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        metrics.inc("villa_sql_pool_connections_total", (engine_label,))
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.inc("villa_sql_pool_checkouts_total", (engine_label,))
+
+
+def collect_pool_metrics(sync_engine, name):
+    pool = sync_engine.pool
+    labels = (("engine", name),)
+    # Only QueuePool and its async variant keep these counters
+    if hasattr(pool, "checkedout"):
+        metrics.set("villa_sql_pool_size", labels, pool.size())
+        metrics.set("villa_sql_pool_checked_out", labels, pool.checkedout())
+        metrics.set("villa_sql_pool_overflow", labels, max(pool.overflow(), 0))
+
+
 # --- FastAPI App ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP_ENABLED:
+        await run_in_threadpool(warm_up)
+        if DB_MODE == "async":
+            await warm_up_async_pool()
+    if WORKER_ID is not None:
+        worker_sync.start()
+    ready.set()
+    yield
+    ready.clear()
+
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # --- CORS (if GUI is running separately) ---
 app.add_middleware(
@@ -51,14 +645,229 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MessagePackMiddleware)
+app.add_middleware(CompressionMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # --- SQLAlchemy Setup ---
-DATABASE_URL = "sqlite:///./villas.db"
+DATABASE_URL = os.getenv("VILLA_DATABASE_URL", "sqlite:///./villas.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 Base = declarative_base()
 SessionLocal = sessionmaker(bind=engine, autoflush=False)
 
+# "sync" runs the routes in the threadpool on `engine`, "async" runs them on
+# the event loop through aiosqlite on `async_engine`.
+DB_MODE = os.getenv("VILLA_DB_MODE", "sync").lower()
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"VILLA_DB_MODE must be 'sync' or 'async', got {DB_MODE!r}")
+
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+if DB_MODE == "async":
+    # Imported here so the default sync mode does not need greenlet
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+if METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    if DB_MODE == "async":
+        instrument_engine(async_engine.sync_engine, "async")
+
+# --- SQLite Profile ---
+# PRAGMAs set on every new connection. "off", the default, keeps SQLite's
+# defaults (rollback journal, FULL sync, 2 MB cache, no mmap). The others must
+# be chosen: they spend memory on speed, and "balanced" and "fast" also give
+# up some durability. Each value of a profile can be overridden with
+# VILLA_SQLITE_<PRAGMA>, e.g. VILLA_SQLITE_SYNCHRONOUS=FULL.
+SQLITE_PROFILES = {
+    "off": {},
+    # WAL lets readers and the writer run concurrently; a commit still waits
+    # for fsync, so it survives power loss
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16384,
+        "temp_store": "MEMORY",
+        "mmap_size": 0,
+    },
+    # WAL's NORMAL only syncs at checkpoints: a power loss can drop the last
+    # commits but never corrupts the file
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,
+    },
+    # No syncs at all; for throwaway or easily rebuilt databases
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+        "mmap_size": 1073741824,
+    },
+}
+SQLITE_PROFILE = os.getenv("VILLA_SQLITE_PROFILE", "off").lower()
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(
+        f"VILLA_SQLITE_PROFILE must be one of {', '.join(SQLITE_PROFILES)},"
+        f" got {SQLITE_PROFILE!r}"
+    )
+SQLITE_PRAGMAS = {
+    name: os.getenv(f"VILLA_SQLITE_{name.upper()}", value)
+    for name, value in SQLITE_PROFILES[SQLITE_PROFILE].items()
+}
+# Seconds between background WAL checkpoints and PRAGMA optimize runs; 0 turns
+# either off
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("VILLA_SQLITE_CHECKPOINT_INTERVAL", "60"))
+SQLITE_OPTIMIZE_INTERVAL = float(os.getenv("VILLA_SQLITE_OPTIMIZE_INTERVAL", "3600"))
+
+
+def apply_sqlite_profile(sync_engine, pragmas):
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+class SQLiteMaintenance:
+    """Background thread running WAL checkpoints and PRAGMA optimize.
+
+    SQLite checkpoints the WAL itself as a side effect of commits, which
+    puts that cost on an unlucky request; a PASSIVE checkpoint here does it
+    off the request path without waiting for readers. PRAGMA optimize
+    refreshes the planner statistics for the tables whose shape changed.
+    """
+
+    def __init__(self, checkpoint_interval, optimize_interval):
+        self.tasks = [
+            (task, interval)
+            for task, interval in (
+                (self.checkpoint, checkpoint_interval),
+                (self.optimize, optimize_interval),
+            )
+            if interval > 0
+        ]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.tasks and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="sqlite-maintenance", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def checkpoint(self):
+        with engine.connect() as conn:
+            _, wal_pages, copied = conn.exec_driver_sql(
+                "PRAGMA wal_checkpoint(PASSIVE)"
+            ).one()
+        logger.debug("WAL checkpoint: %s of %s pages copied", copied, wal_pages)
+
+    def optimize(self):
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+        logger.info("Ran PRAGMA optimize")
+
+    def _run(self):
+        due = [time.monotonic() + interval for _, interval in self.tasks]
+        while not self._stop.wait(max(min(due) - time.monotonic(), 0)):
+            now = time.monotonic()
+            for i, (task, interval) in enumerate(self.tasks):
+                if now < due[i]:
+                    continue
+                due[i] = now + interval
+                try:
+                    task()
+                except SQLAlchemyError as e:
+                    logger.warning("SQLite maintenance failed: %s", e)
+
+
+SQLITE_WAL = str(SQLITE_PRAGMAS.get("journal_mode", "")).upper() == "WAL"
+sqlite_maintenance = SQLiteMaintenance(
+    SQLITE_CHECKPOINT_INTERVAL if SQLITE_WAL else 0, SQLITE_OPTIMIZE_INTERVAL
+)
+if engine.dialect.name == "sqlite":
+    apply_sqlite_profile(engine, SQLITE_PRAGMAS)
+    if DB_MODE == "async":
+        apply_sqlite_profile(async_engine.sync_engine, SQLITE_PRAGMAS)
+    if WORKER_ID is None:
+        # One process is enough; under serve.py that is the launcher
+        sqlite_maintenance.start()
+        atexit.register(sqlite_maintenance.stop)
+
+# --- Pagination ---
+# Upper bound for ?limit= on the list endpoint, keeps a single page bounded
+MAX_PAGE_SIZE = int(os.getenv("VILLA_MAX_PAGE_SIZE", "1000"))
+
+# --- Streaming ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Rows fetched from the SQLite cursor per batch while streaming
+STREAM_BATCH_SIZE = int(os.getenv("VILLA_STREAM_BATCH_SIZE", "500"))
+
+# --- Search ---
+# Default and largest page size of GET /api/VillaAPI/search
+SEARCH_PAGE_SIZE = int(os.getenv("VILLA_SEARCH_PAGE_SIZE", "20"))
+MAX_SEARCH_PAGE_SIZE = int(os.getenv("VILLA_MAX_SEARCH_PAGE_SIZE", "100"))
+
+# --- Fast JSON ---
+# Serve full lists from plain column rows encoded with orjson (when installed)
+# instead of validating every row into the Villa model first
+FAST_JSON = os.getenv("VILLA_FAST_JSON", "1") == "1"
+
+# --- Bulk Create ---
+# Villas inserted per transaction by POST /api/VillaAPI/bulk
+BULK_CHUNK_SIZE = int(os.getenv("VILLA_BULK_CHUNK_SIZE", "1000"))
+
+# --- Batch ---
+# Most operations accepted by one POST /api/VillaAPI/$batch call
+BATCH_MAX_OPERATIONS = int(os.getenv("VILLA_BATCH_MAX_OPERATIONS", "1000"))
+
+# --- Write Queue ---
+# 1 sends POST/PUT/PATCH/DELETE through one writer thread that commits them
+# in groups instead of one transaction (and fsync) per request
+WRITE_QUEUE_ENABLED = os.getenv("VILLA_WRITE_QUEUE", "0") == "1"
+# How long the writer waits for more writes to join a group, in milliseconds
+WRITE_BATCH_WINDOW = float(os.getenv("VILLA_WRITE_BATCH_WINDOW_MS", "2")) / 1000
+# Most writes committed in one transaction
+WRITE_BATCH_SIZE = int(os.getenv("VILLA_WRITE_BATCH_SIZE", "128"))
+
+
+# --- Villa Cache ---
+# Entries kept for single-villa reads; 0 turns the cache off
+VILLA_CACHE_SIZE = int(os.getenv("VILLA_CACHE_SIZE", "1024"))
+# Seconds a cached villa may be served before it is read again
+VILLA_CACHE_TTL = float(os.getenv("VILLA_CACHE_TTL", "30"))
+
+# --- List Snapshot ---
+# Bytes the prebuilt full-list body and its gzip copy may take together; a
+# larger list is served by live queries. 0 turns the snapshot off.
+SNAPSHOT_MAX_BYTES = int(os.getenv("VILLA_SNAPSHOT_MAX_BYTES", str(64 * 1024 * 1024)))
+# Seconds a snapshot is served before it is rebuilt even without a local write,
+# which bounds how long writes made by other processes go unseen
+SNAPSHOT_TTL = float(os.getenv("VILLA_SNAPSHOT_TTL", "30"))
+
 
 # --- ORM Model ---
 class VillaORM(Base):
@@ -75,8 +884,148 @@ class VillaORM(Base):
     createdDate = Column(DateTime, default=datetime.now(timezone.utc))
     updatedDate = Column(DateTime, default=datetime.now(timezone.utc))
 
+    # Back the list endpoint's filters and sorts. SQLite appends the rowid
+    # (id) to every index, so each single-column one also serves the
+    # (column, id) order of keyset pages sorted by that column.
+    __table_args__ = (
+        Index("ix_villas_rate", "rate"),
+        Index("ix_villas_sqft", "sqft"),
+        Index("ix_villas_occupancy", "occupancy"),
+        Index("ix_villas_name", "name"),
+        Index("ix_villas_createdDate", "createdDate"),
+    )
+
+
+# Indexes older files may still have; dropped so writes stop maintaining them
+# (ix_villas_occupancy_rate lost every plan to ix_villas_occupancy)
+OBSOLETE_INDEXES = ("ix_villas_occupancy_rate",)
+
+
+# --- Full-Text Search ---
+# External-content FTS5 index over the long text columns of `villas`, kept in
+# sync by triggers so every write path (ORM, bulk insert, raw SQL) updates it.
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS villas_fts USING fts5(
+        name, details, amenity, content='villas', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS villas_fts_ai AFTER INSERT ON villas BEGIN
+        INSERT INTO villas_fts(rowid, name, details, amenity)
+        VALUES (new.id, new.name, new.details, new.amenity);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS villas_fts_ad AFTER DELETE ON villas BEGIN
+        INSERT INTO villas_fts(villas_fts, rowid, name, details, amenity)
+        VALUES ('delete', old.id, old.name, old.details, old.amenity);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS villas_fts_au
+    AFTER UPDATE OF name, details, amenity ON villas BEGIN
+        INSERT INTO villas_fts(villas_fts, rowid, name, details, amenity)
+        VALUES ('delete', old.id, old.name, old.details, old.amenity);
+        INSERT INTO villas_fts(rowid, name, details, amenity)
+        VALUES (new.id, new.name, new.details, new.amenity);
+    END""",
+]
+
+
+def rebuild_search_index():
+    """Re-index every villa, e.g. after rows were written with triggers absent."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO villas_fts(villas_fts) VALUES ('rebuild')")
+    logger.info("Rebuilt villa search index.")
+
+
+def setup_search_index():
+    """Create the FTS5 table and triggers; False if SQLite lacks FTS5."""
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'villas_fts'"
+            ).first()
+            for statement in SEARCH_DDL:
+                conn.exec_driver_sql(statement)
+    except OperationalError as e:
+        logger.warning("Full-text search disabled: %s", e)
+        return False
+    if not exists:
+        # Index the rows that were already there before search was added
+        rebuild_search_index()
+    return True
+
+
+def search_index_exists():
+    with engine.connect() as conn:
+        return bool(
+            conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'villas_fts'"
+            ).first()
+        )
+
+
+# --- Change Feed ---
+# One row per villa holding its latest change. Triggers move the row to a
+# fresh AUTOINCREMENT seq on every insert, update and delete, so seq only
+# grows, is never reused, and "changed since" is a range scan on the key.
+CHANGES_DDL = [
+    """CREATE TABLE IF NOT EXISTS villa_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        villa_id INTEGER NOT NULL UNIQUE,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS villa_changes_ai AFTER INSERT ON villas BEGIN
+        INSERT OR REPLACE INTO villa_changes(villa_id, deleted) VALUES (new.id, 0);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS villa_changes_au AFTER UPDATE ON villas BEGIN
+        INSERT OR REPLACE INTO villa_changes(villa_id, deleted) VALUES (new.id, 0);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS villa_changes_ad AFTER DELETE ON villas BEGIN
+        INSERT OR REPLACE INTO villa_changes(villa_id, deleted) VALUES (old.id, 1);
+    END""",
+    # Random once per database, so seqs of a replaced file never match
+    """CREATE TABLE IF NOT EXISTS villa_changes_epoch (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        epoch TEXT NOT NULL
+    )""",
+]
+
 
-Base.metadata.create_all(bind=engine)
+def setup_change_feed():
+    """Create the change table and triggers, recording villas already there."""
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'villa_changes'"
+        ).first()
+        for statement in CHANGES_DDL:
+            conn.exec_driver_sql(statement)
+        # OR IGNORE: processes setting up the same file keep the first epoch
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO villa_changes_epoch (id, epoch) VALUES (1, ?)",
+            (uuid.uuid4().hex[:8],),
+        )
+        if not exists:
+            conn.exec_driver_sql(
+                "INSERT INTO villa_changes (villa_id) SELECT id FROM villas ORDER BY id"
+            )
+
+
+def init_database():
+    """Create or upgrade the schema, then the search index and change feed.
+
+    Runs at import, except in serve.py's workers: the launcher runs it once
+    before starting them, instead of every worker racing through the DDL.
+    """
+    Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add indexes missing from older files
+    for index in VillaORM.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+    setup_search_index()
+    setup_change_feed()
+
+
+if WORKER_ID is None:
+    init_database()
+SEARCH_ENABLED = search_index_exists()
 
 
 # --- Pydantic Schemas ---
@@ -90,6 +1039,10 @@ class VillaBase(BaseModel):
     amenity: str
 
 
+# SQLite INTEGER columns hold signed 64-bit values, larger ints can't be bound
+SQLITE_INT_MIN, SQLITE_INT_MAX = -(2**63), 2**63 - 1
+
+
 class Villa(VillaBase):
     id: int
     createdDate: datetime
@@ -99,83 +1052,1854 @@ class Villa(VillaBase):
         orm_mode = True
 
 
+class VillaSearchResult(Villa):
+    snippet: str
+    rank: float
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "patch", "delete"]
+    id: Optional[int] = None
+    # VillaBase fields for create/update, a list of patch operations for patch
+    body: Any = None
+
+
+class BatchRequest(BaseModel):
+    atomic: bool = False
+    operations: List[BatchOperation]
+
+
+# Field order of the Villa schema, used for every hand-built villa dict
+VILLA_FIELDS = (
+    "name",
+    "details",
+    "rate",
+    "sqft",
+    "occupancy",
+    "imageUrl",
+    "amenity",
+    "id",
+    "createdDate",
+    "updatedDate",
+)
+
+
+def villa_to_dict(villa, fields=VILLA_FIELDS):
+    """Plain JSON-ready dict of a villa row, same shape as the Villa schema.
+
+    Works on ORM objects and on column rows; `fields` picks a subset.
+    """
+    data = {}
+    for name in fields:
+        value = getattr(villa, name)
+        data[name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def parse_fields(fields: Optional[str] = None):
+    """Columns asked for with ?fields=a,b in schema order; id is always sent."""
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(VILLA_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return tuple(name for name in VILLA_FIELDS if name in names or name == "id")
+
+
+def villa_columns(names):
+    return [VillaORM.__table__.c[name] for name in dict.fromkeys(names)]
+
+
+class VillaCache:
+    """Thread-safe LRU cache with a per-entry TTL for single-villa reads.
+
+    Writers call `invalidate` after committing. Readers take `version` before
+    going to the database and pass it to `put`, so a row read before a
+    concurrent write can't be cached after that write invalidated it.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self.version += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+villa_cache = VillaCache(VILLA_CACHE_SIZE, VILLA_CACHE_TTL)
+
+
+# --- Conditional GET ---
+class CollectionVersion:
+    """The villa list's version: "<epoch>-<seq>" of the change feed.
+
+    The villa_changes triggers advance seq on every committed write, made by
+    this process, another worker or a script, so the version is read from
+    the database rather than counted here. Every process serving the file
+    computes the same version, and so the same list ETags. A dedicated
+    connection checks PRAGMA data_version, which moves whenever another
+    connection commits, and the version is only read again when it did.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self.value = None
+
+    def get(self):
+        with self._lock:
+            if self._conn is None:
+                # Out of the pool for good, so requests never wait for it
+                self._conn = engine.raw_connection()
+                self._conn.detach()
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute("PRAGMA data_version")
+                (data_version,) = cursor.fetchone()
+                if data_version != self._data_version:
+                    cursor.execute(
+                        "SELECT epoch, (SELECT COALESCE(MAX(seq), 0)"
+                        " FROM villa_changes) FROM villa_changes_epoch"
+                    )
+                    self.value = "-".join(map(str, cursor.fetchone()))
+                    self._data_version = data_version
+            finally:
+                cursor.close()
+            return self.value
+
+    def expire(self):
+        with self._lock:
+            self._data_version = None
+
+
+collection_version = CollectionVersion()
+
+
+def bump_collection_version():
+    """Called after every committed write so list ETags change.
+
+    Only a shortcut for this process's writes: collection_version would see
+    them anyway. Also wakes the event stream, which reads what was committed.
+    """
+    collection_version.expire()
+    villa_events.notify()
+
+
+def collection_etag(request: Request, version):
+    # Pages, streams and other variants of the list each get their own tag
+    variant = f"{request.url.query}|{request.headers.get('accept', '')}"
+    return f'"{version}-{zlib.crc32(variant.encode()):08x}"'
+
+
+def villa_etag(data, fields=None):
+    etag = f'{data["id"]}-{data["updatedDate"]}'
+    if fields is not None:
+        etag += f'-{zlib.crc32(",".join(fields).encode()):08x}'
+    if use_msgpack.get():
+        etag += "-msgpack"
+    return f'"{etag}"'
+
+
+def not_modified(request: Request, etag):
+    """A 304 response when If-None-Match already names `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = []
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in ENCODING_ETAG_SUFFIXES:
+            # Tags of compressed bodies still name the same content
+            if tag.endswith(f'{suffix}"'):
+                tag = tag[: -len(suffix) - 1] + '"'
+        candidates.append(tag)
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def villa_response(request: Request, response: Response, data, fields=None):
+    """Tag a single villa with its ETag, or answer 304 if the client has it."""
+    etag = villa_etag(data, fields)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if fields is not None:
+        # Not a full Villa, so skip response_model validation
+        return FastJSONResponse(
+            {name: data[name] for name in fields}, headers={"ETag": etag}
+        )
+    response.headers["ETag"] = etag
+    return data
+
+
+def villa_item_statement(villa_id, fields):
+    """SELECT of the requested columns of one villa, plus updatedDate for the ETag."""
+    columns = villa_columns(fields + ("updatedDate",))
+    return select(*columns).where(VillaORM.id == villa_id)
+
+
+def column_list_response(rows, fields, response: Response):
+    """Encode column rows directly, without building Villa models."""
+    headers = {
+        name: response.headers[name]
+        for name in ("ETag", "X-Next-Cursor")
+        if name in response.headers
+    }
+    # Rows start with `fields` in order, extra sort key columns are dropped
+    return FastJSONResponse([dict(zip(fields, row)) for row in rows], headers=headers)
+
+
+def wants_stream(request: Request, stream: bool):
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+# Columns the list can be sorted by: the ones with an index in that order,
+# so no page has to sort the whole table
+SORT_KEYS = ("id", "name", "rate", "sqft", "occupancy", "createdDate")
+
+
+def unindexed(column):
+    """`+column`: same values and order, but SQLite won't use an index for it."""
+    return UnaryExpression(column, operator=operators.custom_op("+"))
+
+
+class VillaListQuery:
+    """Filter, sort and cursor parameters shared by the list routes.
+
+    `sort` takes a column of SORT_KEYS, prefixed with "-" for descending
+    order. Pages continue from `after_id` when sorted by id, or from the
+    opaque `cursor` returned in X-Next-Cursor for any sort.
+    """
+
+    def __init__(
+        self,
+        after_id: Optional[int] = Query(None, ge=0),
+        cursor: Optional[str] = None,
+        rate_min: Optional[float] = None,
+        rate_max: Optional[float] = None,
+        occupancy_min: Optional[int] = None,
+        sqft_min: Optional[int] = None,
+        sqft_max: Optional[int] = None,
+        name_prefix: Optional[str] = Query(None, min_length=1),
+        sort: str = "id",
+    ):
+        self.descending = sort.startswith("-")
+        self.sort_key = sort.lstrip("-")
+        if self.sort_key not in SORT_KEYS:
+            raise HTTPException(status_code=422, detail=f"Cannot sort by '{sort}'")
+        self.sort_column = VillaORM.__table__.columns[self.sort_key]
+
+        # (column, comparison, value) of each filter
+        self.bounds = []
+        if rate_min is not None:
+            self.bounds.append((VillaORM.rate, operator.ge, rate_min))
+        if rate_max is not None:
+            self.bounds.append((VillaORM.rate, operator.le, rate_max))
+        if occupancy_min is not None:
+            self.bounds.append((VillaORM.occupancy, operator.ge, occupancy_min))
+        if sqft_min is not None:
+            self.bounds.append((VillaORM.sqft, operator.ge, sqft_min))
+        if sqft_max is not None:
+            self.bounds.append((VillaORM.sqft, operator.le, sqft_max))
+        if name_prefix is not None:
+            # A range instead of LIKE 'x%' so SQLite can seek the name index
+            self.bounds.append((VillaORM.name, operator.ge, name_prefix))
+            self.bounds.append((VillaORM.name, operator.lt, name_prefix + "\U0010ffff"))
+        self.conditions = [
+            compare(column, value) for column, compare, value in self.bounds
+        ]
+        # Names of the filtered columns, see filter_probe_statement
+        self.filtered = {column.key for column, _, _ in self.bounds}
+        # Whether to seek the filter's index (True) or walk the sort order
+        # (False); None leaves the choice to SQLite. Set by plan_villa_list.
+        self.seek = None
+
+        # Sort key values of the last row already sent, see villa_list_statement
+        self.after = None
+        if cursor is not None:
+            self.after = self.decode_cursor(cursor)
+        elif after_id is not None:
+            if self.sort_key != "id":
+                raise HTTPException(
+                    status_code=422, detail="after_id needs sort=id, use cursor"
+                )
+            self.after = (after_id,)
+
+    def decode_cursor(self, cursor):
+        if self.sort_key == "id":
+            if not cursor.isdigit():
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            return (int(cursor),)
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if isinstance(self.sort_column.type, DateTime) and value is not None:
+                value = datetime.fromisoformat(value)
+            return value, int(last_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @property
+    def is_full_list(self):
+        """No filter, cursor or custom order: every villa by ascending id."""
+        return (
+            not self.conditions
+            and self.after is None
+            and self.sort_key == "id"
+            and not self.descending
+        )
+
+    def where(self, walk=False):
+        """The filter conditions; with `walk`, none of them can use an index."""
+        if not walk:
+            return self.conditions
+        return [
+            compare(unindexed(column), value) for column, compare, value in self.bounds
+        ]
+
+    def encode_cursor(self, villa):
+        if self.sort_key == "id":
+            return str(villa.id)
+        value = getattr(villa, self.sort_key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        token = json.dumps([value, villa.id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(token.encode()).decode()
+
+
+# Filters matching at most this many villas seek their index and sort the
+# matches; broader ones walk the sort order's index until the page is full.
+# Walking wins from about sqrt(page size * villas) matches on.
+FILTER_SEEK_MAX_ROWS = 5000
+
+
+def filter_probe_statement(query: VillaListQuery):
+    """COUNT of the villas the filters match, stopping past FILTER_SEEK_MAX_ROWS.
+
+    None when there is nothing to choose: no filter, or a filter on the sort
+    column, whose index then serves both.
+    """
+    if not query.conditions or query.sort_key in query.filtered:
+        return None
+    matches = select(VillaORM.id).where(*query.conditions)
+    return select(func.count()).select_from(
+        matches.limit(FILTER_SEEK_MAX_ROWS + 1).subquery()
+    )
+
+
+def plan_villa_list(db, query: VillaListQuery):
+    """Decide between seeking the filter's index and walking the sort order.
+
+    Left to itself, SQLite walks the sort order for one-sided filters even
+    when a handful of villas match, reading the whole table, and sorts every
+    match of a broad two-sided range on every page. The capped count reads
+    at most FILTER_SEEK_MAX_ROWS + 1 index entries.
+    """
+    stmt = filter_probe_statement(query)
+    if stmt is not None:
+        query.seek = db.execute(stmt).scalar() <= FILTER_SEEK_MAX_ROWS
+
+
+async def plan_villa_list_async(db, query: VillaListQuery):
+    stmt = filter_probe_statement(query)
+    if stmt is not None:
+        query.seek = (await db.execute(stmt)).scalar() <= FILTER_SEEK_MAX_ROWS
+
+
+def villa_list_statement(limit, query: VillaListQuery, fields=None):
+    """SELECT for one keyset page of villas in the requested order.
+
+    With `fields`, only those columns (plus the sort key for the cursor) are
+    read instead of whole ORM rows. Follows `query.seek` when it is set, see
+    plan_villa_list.
+    """
+    if fields is None:
+        stmt = select(VillaORM)
+    else:
+        stmt = select(*villa_columns(fields + (query.sort_key,)))
+    stmt = stmt.where(*query.where(walk=query.seek is False))
+    if query.sort_key == "id":
+        keys = (VillaORM.id,)
+    else:
+        # id breaks ties so the cursor always points at exactly one row
+        keys = (query.sort_column, VillaORM.id)
+    if query.seek:
+        # Neither the order nor the cursor may pull SQLite onto the sort
+        # order's index; only the filter's is left
+        keys = tuple(unindexed(key) for key in keys)
+    if query.after is not None:
+        position, cursor = tuple_(*keys), tuple_(*query.after)
+        stmt = stmt.where(position < cursor if query.descending else position > cursor)
+    stmt = stmt.order_by(*(key.desc() if query.descending else key for key in keys))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def page_limit(limit):
+    # Fetch one extra row to know whether another page exists
+    return None if limit is None else limit + 1
+
+
+def trim_page(villas, limit, query: VillaListQuery, response: Response):
+    """Cut the look-ahead row off a page and advertise the next cursor."""
+    if limit is not None and len(villas) > limit:
+        villas = villas[:limit]
+        response.headers["X-Next-Cursor"] = query.encode_cursor(villas[-1])
+    return villas
+
+
+def stream_villas(limit, query: VillaListQuery, fields=None):
+    """Yield villas as NDJSON lines straight off the database cursor."""
+    count = 0
+    with SessionLocal() as db:
+        plan_villa_list(db, query)
+        stmt = villa_list_statement(limit, query, fields).execution_options(
+            stream_results=True, yield_per=STREAM_BATCH_SIZE
+        )
+        result = db.execute(stmt)
+        for villa in result.scalars() if fields is None else result:
+            count += 1
+            yield encode_json(villa_to_dict(villa, fields or VILLA_FIELDS)) + b"\n"
+            if fields is None:
+                # Drop the row from the identity map so memory stays flat
+                db.expunge(villa)
+    logger.info("Streamed %s villas.", count)
+
+
+async def stream_villas_async(limit, query: VillaListQuery, fields=None):
+    count = 0
+    async with AsyncSessionLocal() as db:
+        await plan_villa_list_async(db, query)
+        stmt = villa_list_statement(limit, query, fields).execution_options(
+            yield_per=STREAM_BATCH_SIZE
+        )
+        result = await db.stream(stmt)
+        async for villa in result.scalars() if fields is None else result:
+            count += 1
+            yield encode_json(villa_to_dict(villa, fields or VILLA_FIELDS)) + b"\n"
+            if fields is None:
+                db.expunge(villa)
+    logger.info("Streamed %s villas.", count)
+
+
+# --- List Snapshot ---
+class VillaListSnapshot:
+    """The encoded body of GET /api/VillaAPI, kept between writes.
+
+    Built on the first full-list request after a write (any change of the
+    collection version) and then handed out as-is with no database access,
+    along with a gzip copy for clients that accept it. When the two don't
+    fit in `max_bytes`, nothing is kept and requests fall back to live
+    queries until the next write.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.version = None
+        self.expires_at = 0.0
+        self.body = None
+        self.gzip_body = None
+        self.hits = 0
+        self.builds = 0
+        self.over_budget = 0
+
+    def get(self, version):
+        """(body, gzip body or None) of the list at `version`, None if too big.
+
+        `version` is collection_version's, read before the call, so a write
+        racing a build leaves the snapshot stale rather than mislabeled.
+        """
+        with self._lock:
+            if self.version != version or self.expires_at < time.monotonic():
+                return self.build(version)
+            if self.body is None:
+                return None
+            self.hits += 1
+            return self.body, self.gzip_body
+
+    def build(self, version):
+        self.body = self.gzip_body = None
+        with SessionLocal() as db:
+            stmt = select(*villa_columns(VILLA_FIELDS)).order_by(VillaORM.id)
+            rows = db.execute(stmt).all()
+        body = encode_json([dict(zip(VILLA_FIELDS, row)) for row in rows])
+        self.version = version
+        self.expires_at = time.monotonic() + self.ttl
+        self.builds += 1
+        if len(body) > self.max_bytes:
+            self.over_budget += 1
+            logger.info(
+                "Villa list (%s bytes) exceeds the snapshot budget, serving it live",
+                len(body),
+            )
+            # This request still gets what was just read; later ones query
+            # the database themselves until the next write
+            return body, None
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        gzip_body = compressor.compress(body) + compressor.flush()
+        self.body = body
+        if len(body) + len(gzip_body) <= self.max_bytes:
+            self.gzip_body = gzip_body
+        logger.info("Built villa list snapshot of %s villas.", len(rows))
+        return self.body, self.gzip_body
+
+    def stats(self):
+        with self._lock:
+            return {
+                "maxBytes": self.max_bytes,
+                "bytes": len(self.body or b"") + len(self.gzip_body or b""),
+                "hits": self.hits,
+                "builds": self.builds,
+                "overBudget": self.over_budget,
+            }
+
+
+villa_snapshot = VillaListSnapshot(SNAPSHOT_MAX_BYTES, SNAPSHOT_TTL)
+
+
+def uses_snapshot(limit, query: VillaListQuery, fields):
+    return (
+        SNAPSHOT_MAX_BYTES > 0
+        and limit is None
+        and query.is_full_list
+        and fields == VILLA_FIELDS
+        and not use_msgpack.get()
+    )
+
+
+def snapshot_response(request: Request, snapshot, etag):
+    body, gzip_body = snapshot
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    offered = offered_encodings(request.headers.get("accept-encoding", ""))
+    if gzip_body is not None and offered.get("gzip", 0) > 0:
+        body = gzip_body
+        # Same tag CompressionMiddleware would have given it
+        headers["ETag"] = etag[:-1] + '-gzip"'
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# --- JSON Patch ---
+# RFC 6902 documents are compiled into the SET clause and WHERE guards of a
+# single UPDATE, so the row is never loaded. Each villa field is a required
+# scalar: add/replace set it, copy sets it from another field's value as of
+# that point in the document, test becomes a compare-and-set guard, and
+# remove (and so move, apart from moving a field onto itself) is rejected.
+PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+# Writable fields and their types; `test` can also check the id
+PATCH_FIELD_TYPES = dict(VillaBase.__annotations__)
+TEST_FIELD_TYPES = {**PATCH_FIELD_TYPES, "id": int}
+
+
+def patch_error(index: int, message: str):
+    return HTTPException(status_code=422, detail=f"Operation {index}: {message}")
+
+
+def patch_field(index: int, operation: dict, member: str, fields):
+    """Villa field addressed by a JSON Pointer member of an operation."""
+    pointer = operation.get(member)
+    if not isinstance(pointer, str):
+        raise patch_error(index, f"'{member}' must be a JSON Pointer string")
+    field = pointer[1:].replace("~1", "/").replace("~0", "~")
+    if not pointer.startswith("/") or field not in fields:
+        raise patch_error(index, f"'{pointer}' is not a patchable villa field")
+    return field
+
+
+def coerce_patch_value(index: int, field: str, value):
+    """`value` as the type of `field`; numeric strings are accepted."""
+    kind = TEST_FIELD_TYPES[field]
+    if kind is not str and isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            pass
+    if kind is int and isinstance(value, float) and value.is_integer():
+        value = int(value)
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(value, kind) and not isinstance(value, bool):
+        if kind is int and not SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+            raise patch_error(index, f"'{field}' must fit in a 64-bit signed integer")
+        if kind is not float or math.isfinite(value):
+            return value
+    elif kind is float and numeric and math.isfinite(value):
+        return float(value)
+    raise patch_error(index, f"'{field}' must be {kind.__name__}, got {value!r}")
+
+
+def compile_villa_patch(document: List[dict]):
+    """Validate a JSON Patch document and return (values, guards) for UPDATE.
+
+    `values` maps columns to literals or to the column they were copied
+    from; `guards` are the conditions of the `test` operations.
+    """
+    values, guards = {}, []
+    for index, operation in enumerate(document):
+        op = operation.get("op")
+        if op not in PATCH_OPS:
+            raise patch_error(index, f"unknown op {op!r}")
+        if op == "test":
+            field = patch_field(index, operation, "path", TEST_FIELD_TYPES)
+        else:
+            field = patch_field(index, operation, "path", PATCH_FIELD_TYPES)
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise patch_error(index, f"'{op}' needs a 'value'")
+
+        if op in ("add", "replace"):
+            values[field] = coerce_patch_value(index, field, operation["value"])
+        elif op == "test":
+            expected = coerce_patch_value(index, field, operation["value"])
+            current = values.get(field, VillaORM.__table__.c[field])
+            if isinstance(current, Column):
+                guards.append(current == expected)
+            elif current != expected:
+                # Known to fail, but the villa may not exist either
+                guards.append(false())
+        elif op == "remove":
+            raise patch_error(index, f"'{field}' is required and can't be removed")
+        else:
+            source = patch_field(index, operation, "from", PATCH_FIELD_TYPES)
+            if op == "move" and source != field:
+                raise patch_error(
+                    index, f"moving removes '{source}', which is required"
+                )
+            value = values.get(source, VillaORM.__table__.c[source])
+            source_type = PATCH_FIELD_TYPES[source]
+            if not isinstance(value, Column):
+                values[field] = coerce_patch_value(index, field, value)
+            elif source_type is PATCH_FIELD_TYPES[field] or (
+                source_type is int and PATCH_FIELD_TYPES[field] is float
+            ):
+                values[field] = value
+            else:
+                raise patch_error(index, f"can't copy '{source}' into '{field}'")
+    values["updatedDate"] = datetime.now(timezone.utc)
+    return values, guards
+
+
+def villa_patch_statement(villa_id: int, values: dict, guards: list):
+    # Copies read the column values from before this UPDATE, which is what
+    # the document saw at that point, since earlier sets were resolved
+    condition = and_(VillaORM.id == villa_id, *guards)
+    return update(VillaORM.__table__).where(condition).values(values)
+
+
+def villa_exists_statement(villa_id: int):
+    return select(VillaORM.id).where(VillaORM.id == villa_id)
+
+
+def reject_villa_patch(villa_id: int, exists):
+    """Explain why a patch matched no row: a failed test (409) or a 404."""
+    if exists:
+        logger.warning("Patch of villa ID %s failed a test operation.", villa_id)
+        raise HTTPException(status_code=409, detail="Test operation failed")
+    require_villa(0, villa_id, "Patch")
+
+
+# --- Write Operations ---
+# Shared by the single-villa routes and the $batch endpoint. They change the
+# session but leave committing (and cache/version bookkeeping) to the caller.
+def create_villa_row(db, villa: VillaBase):
+    # One timestamp for both, so "never updated" is createdDate == updatedDate
+    now = datetime.now(timezone.utc)
+    new_villa = VillaORM(**villa.dict(), createdDate=now, updatedDate=now)
+    db.add(new_villa)
+    return new_villa
+
+
+# PUT, PATCH and DELETE are single statements; a rowcount of 0 means the
+# villa doesn't exist, so no row is loaded beforehand.
+def villa_update_statement(villa_id: int, values: dict):
+    return update(VillaORM.__table__).where(VillaORM.id == villa_id).values(values)
+
+
+def villa_delete_statement(villa_id: int):
+    return delete(VillaORM.__table__).where(VillaORM.id == villa_id)
+
+
+def require_villa(rowcount, villa_id: int, action: str):
+    if not rowcount:
+        logger.warning("%s failed. Villa with ID %s not found.", action, villa_id)
+        raise HTTPException(status_code=404, detail="Villa not found")
+
+
+def villa_put_values(villa: VillaBase):
+    return {**villa.dict(), "updatedDate": datetime.utcnow()}
+
+
+def log_patched_fields(villa_id: int, values: dict):
+    for path, value in values.items():
+        if path != "updatedDate":
+            logger.info("Patched villa ID %s: set %s = %s", villa_id, path, value)
+
+
+def update_villa_row(db, villa_id: int, villa: VillaBase):
+    result = db.execute(villa_update_statement(villa_id, villa_put_values(villa)))
+    require_villa(result.rowcount, villa_id, "Update")
+
+
+def patch_villa_row(db, villa_id: int, document: List[dict]):
+    values, guards = compile_villa_patch(document)
+    result = db.execute(villa_patch_statement(villa_id, values, guards))
+    if not result.rowcount:
+        exists = guards and db.execute(villa_exists_statement(villa_id)).first()
+        reject_villa_patch(villa_id, exists)
+    log_patched_fields(villa_id, values)
+
+
+def delete_villa_row(db, villa_id: int):
+    result = db.execute(villa_delete_statement(villa_id))
+    require_villa(result.rowcount, villa_id, "Delete")
+
+
+class VillaWriteQueue:
+    """Group commit for the single-villa write routes.
+
+    SQLite runs one writer at a time, so instead of each request opening
+    its own transaction (and waiting for the lock, then an fsync), requests
+    submit a write function such as `update_villa_row` and one writer thread
+    applies everything queued within `window` seconds in a single
+    transaction. Each write's future gets its own result or HTTPException.
+    If the group fails to commit as a whole, its writes are retried one
+    transaction each so that only the failing one reports the error.
+    """
+
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, write, *args):
+        """Queue `write(db, *args)`; returns a concurrent.futures.Future."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="villa-writer", daemon=True
+                    )
+                    self._thread.start()
+        future = concurrent.futures.Future()
+        self.pending.put((future, write, args))
+        return future
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self.pending.get(timeout=timeout))
+                else:
+                    # Past the window, only take what is already waiting
+                    batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        # Writes whose request has gone away (async client disconnects)
+        return [item for item in batch if item[0].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._commit(batch)
+                if METRICS_ENABLED:
+                    metrics.observe("villa_write_batch_size", (), len(batch))
+
+    def _commit(self, batch):
+        outcomes = []
+        with SessionLocal() as db:
+            try:
+                for future, write, args in batch:
+                    try:
+                        outcomes.append((future, write(db, *args), None))
+                    except HTTPException as e:
+                        # Nothing was changed, e.g. a 404 or a failed test op
+                        outcomes.append((future, None, e))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                if len(batch) == 1:
+                    batch[0][0].set_exception(e)
+                    return
+                logger.warning(
+                    "Group commit of %s writes failed (%s), retrying one by one",
+                    len(batch),
+                    e,
+                )
+                for item in batch:
+                    self._commit([item])
+                return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+villa_writes = VillaWriteQueue(WRITE_BATCH_WINDOW, WRITE_BATCH_SIZE)
+
+
+def commit_villa_write(write, *args):
+    """Apply `write(db, *args)` and commit it, through the write queue if on."""
+    if WRITE_QUEUE_ENABLED:
+        return villa_writes.submit(write, *args).result()
+    with SessionLocal() as db:
+        result = write(db, *args)
+        db.commit()
+        return result
+
+
 # --- API Routes ---
-@app.get("/api/VillaAPI", response_model=List[Villa])
-def get_all_villas():
+villa_router = APIRouter(default_response_class=FastJSONResponse)
+
+
+@villa_router.get("/api/VillaAPI", response_model=List[Villa])
+def get_all_villas(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    query: VillaListQuery = Depends(),
+    fields: Optional[tuple] = Depends(parse_fields),
+    stream: bool = False,
+):
+    if fields is None and FAST_JSON:
+        fields = VILLA_FIELDS
+
+    # Taken before reading so a write racing this request changes the tag
+    version = collection_version.get()
+    etag = collection_etag(request, version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    if wants_stream(request, stream):
+        return StreamingResponse(
+            stream_villas(limit, query, fields),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag},
+        )
+
+    if uses_snapshot(limit, query, fields):
+        snapshot = villa_snapshot.get(version)
+        if snapshot is not None:
+            return snapshot_response(request, snapshot, etag)
+
     with SessionLocal() as db:
-        villas = db.query(VillaORM).all()
-        logger.info(f"Retrieved {len(villas)} villas.")
+        # Keyset pagination: walk the primary key index from the cursor
+        # instead of OFFSET, so every page costs the same.
+        plan_villa_list(db, query)
+        stmt = villa_list_statement(page_limit(limit), query, fields)
+        result = db.execute(stmt)
+        rows = result.scalars().all() if fields is None else result.all()
+        villas = trim_page(rows, limit, query, response)
+        response.headers["ETag"] = etag
+        logger.info("Retrieved %s villas.", len(villas))
+        if fields is not None:
+            return column_list_response(villas, fields, response)
         return villas
 
 
-@app.get("/api/VillaAPI/{villa_id}", response_model=Villa)
-def get_villa(villa_id: int = Path(...)):
+@villa_router.get("/api/VillaAPI/{villa_id}", response_model=Villa)
+def get_villa(
+    request: Request,
+    response: Response,
+    villa_id: int = Path(...),
+    fields: Optional[tuple] = Depends(parse_fields),
+):
+    cached = villa_cache.get(villa_id)
+    if cached is not None:
+        logger.info("Retrieved villa with ID %s (cached)", villa_id)
+        return villa_response(request, response, cached, fields)
+
+    if fields is not None:
+        # Partial rows are not cached, the cache only holds whole villas
+        with SessionLocal() as db:
+            row = db.execute(villa_item_statement(villa_id, fields)).first()
+        if row is None:
+            logger.warning("Villa with ID %s not found.", villa_id)
+            raise HTTPException(status_code=404, detail="Villa not found")
+        logger.info("Retrieved villa with ID %s", villa_id)
+        data = villa_to_dict(row, fields + ("updatedDate",))
+        return villa_response(request, response, data, fields)
+
+    version = villa_cache.version
     with SessionLocal() as db:
         villa = db.query(VillaORM).get(villa_id)
         if not villa:
-            logger.warning(f"Villa with ID {villa_id} not found.")
+            logger.warning("Villa with ID %s not found.", villa_id)
             raise HTTPException(status_code=404, detail="Villa not found")
-        logger.info(f"Retrieved villa with ID {villa_id}")
-        return villa
+        logger.info("Retrieved villa with ID %s", villa_id)
+        data = villa_to_dict(villa)
+    villa_cache.put(villa_id, data, version)
+    return villa_response(request, response, data)
 
 
-@app.post("/api/VillaAPI", status_code=201)
+@villa_router.post("/api/VillaAPI", status_code=201)
 def create_villa(villa: VillaBase):
-    with SessionLocal() as db:
-        new_villa = VillaORM(
-            **villa.dict(),
-            createdDate=datetime.now(timezone.utc),
-            updatedDate=datetime.now(timezone.utc),
-        )
-        db.add(new_villa)
-        db.commit()
-        logger.info(f"Created villa: {villa.name}")
-        return {"message": "Villa created successfully"}
+    commit_villa_write(create_villa_row, villa)
+    bump_collection_version()
+    logger.info("Created villa: %s", villa.name)
+    return {"message": "Villa created successfully"}
 
 
-@app.put("/api/VillaAPI/{villa_id}", status_code=204)
+@villa_router.put("/api/VillaAPI/{villa_id}", status_code=204)
 def update_villa(villa_id: int, villa: VillaBase):
+    commit_villa_write(update_villa_row, villa_id, villa)
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Updated villa ID %s", villa_id)
+
+
+@villa_router.patch("/api/VillaAPI/{villa_id}", status_code=204)
+def patch_villa(villa_id: int, updates: List[dict]):
+    commit_villa_write(patch_villa_row, villa_id, updates)
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Completed patch for villa ID %s", villa_id)
+
+
+@villa_router.delete("/api/VillaAPI/{villa_id}", status_code=204)
+def delete_villa(villa_id: int):
+    commit_villa_write(delete_villa_row, villa_id)
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Deleted villa with ID %s", villa_id)
+
+
+@app.get("/api/VillaAPI/cache/stats")
+def get_villa_cache_stats():
+    return {**villa_cache.stats(), "snapshot": villa_snapshot.stats()}
+
+
+if METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        collect_pool_metrics(engine, "sync")
+        if DB_MODE == "async":
+            collect_pool_metrics(async_engine.sync_engine, "async")
+        cache = villa_cache.stats()
+        metrics.set("villa_cache_entries", (), cache["size"])
+        metrics.set("villa_cache_hits_total", (), cache["hits"])
+        metrics.set("villa_cache_misses_total", (), cache["misses"])
+        return Response(metrics.render(), media_type=METRICS_MEDIA_TYPE)
+
+
+# --- Change Feed ---
+villa_changes = table(
+    "villa_changes", column("seq"), column("villa_id"), column("deleted")
+)
+
+
+def villa_changes_statement(since: int, limit: int):
+    """Changes after `since` in seq order, joined to the villas still there."""
+    return (
+        select(
+            villa_changes.c.seq, villa_changes.c.deleted, *villa_columns(VILLA_FIELDS)
+        )
+        .join_from(
+            villa_changes,
+            VillaORM,
+            VillaORM.id == villa_changes.c.villa_id,
+            isouter=True,
+        )
+        .add_columns(villa_changes.c.villa_id)
+        .where(villa_changes.c.seq > since)
+        .order_by(villa_changes.c.seq)
+        .limit(limit)
+    )
+
+
+def latest_change_statement():
+    return select(func.coalesce(func.max(villa_changes.c.seq), 0))
+
+
+def change_villa(row):
+    return dict(zip(VILLA_FIELDS, row[2:-1]))
+
+
+@app.get("/api/VillaAPI/changes")
+def get_villa_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Villas created or updated after `since`, and tombstones of deletions.
+
+    Pass the returned `cursor` as the next `since`; `hasMore` means another
+    page is ready right away. since=0 returns every villa.
+    """
     with SessionLocal() as db:
-        db_villa = db.query(VillaORM).get(villa_id)
-        if not db_villa:
-            logger.warning(f"Update failed. Villa with ID {villa_id} not found.")
-            raise HTTPException(status_code=404, detail="Villa not found")
+        rows = db.execute(villa_changes_statement(since, limit + 1)).all()
+        if not rows and since:
+            if since > db.execute(latest_change_statement()).scalar():
+                # E.g. the database was replaced; the client has to start over
+                raise HTTPException(
+                    status_code=410, detail="Cursor is ahead of the change feed"
+                )
 
-        for key, value in villa.dict().items():
-            setattr(db_villa, key, value)
-        db_villa.updatedDate = datetime.utcnow()
-        db.commit()
-        logger.info(f"Updated villa ID {villa_id}")
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        {"id": row.villa_id, "deleted": True} if row.deleted else change_villa(row)
+        for row in rows
+    ]
+    cursor = rows[-1].seq if rows else since
+    logger.info("Change feed since %s returned %s changes.", since, len(changes))
+    return {"cursor": cursor, "hasMore": has_more, "changes": changes}
 
 
-@app.patch("/api/VillaAPI/{villa_id}", status_code=204)
-def patch_villa(villa_id: int, updates: List[dict]):
+# --- Events ---
+# Buffered events per subscriber; a subscriber that falls this far behind is
+# disconnected and resumes through Last-Event-ID
+EVENTS_BUFFER_SIZE = int(os.getenv("VILLA_EVENTS_BUFFER_SIZE", "256"))
+# Seconds between keep-alive comments on an idle stream
+EVENTS_KEEPALIVE = float(os.getenv("VILLA_EVENTS_KEEPALIVE", "15"))
+# Seconds between checks for changes committed by other processes
+EVENTS_POLL_INTERVAL = float(os.getenv("VILLA_EVENTS_POLL_INTERVAL", "1"))
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+def read_changes_after(since: int, limit: int = MAX_PAGE_SIZE):
     with SessionLocal() as db:
-        db_villa = db.query(VillaORM).get(villa_id)
-        if not db_villa:
-            logger.warning(f"Patch failed. Villa with ID {villa_id} not found.")
-            raise HTTPException(status_code=404, detail="Villa not found")
+        return db.execute(villa_changes_statement(since, limit)).all()
 
-        for update in updates:
-            if update.get("op") == "replace":
-                path = update.get("path", "").lstrip("/")
-                value = update.get("value")
-                if hasattr(db_villa, path):
-                    setattr(db_villa, path, value)
-                    logger.info(f"Patched villa ID {villa_id}: set {path} = {value}")
 
-        db_villa.updatedDate = datetime.now(timezone.utc)
-        db.commit()
-        logger.info(f"Completed patch for villa ID {villa_id}")
+def read_latest_change():
+    with SessionLocal() as db:
+        return db.execute(latest_change_statement()).scalar()
 
 
-@app.delete("/api/VillaAPI/{villa_id}", status_code=204)
-def delete_villa(villa_id: int):
+def format_event(row):
+    """A villa_changes row as an SSE message whose id is the change seq."""
+    if row.deleted:
+        kind, data = "deleted", {"id": row.villa_id}
+    else:
+        data = change_villa(row)
+        # Creates and later updates of one villa share a change row, so
+        # the timestamps tell whether it was ever updated
+        same = data["createdDate"] == data["updatedDate"]
+        kind = "created" if same else "updated"
+    return (
+        f"id: {row.seq}\nevent: {kind}\ndata: ".encode() + encode_json(data) + b"\n\n"
+    )
+
+
+class VillaEventBroker:
+    """Fans committed villa changes out to event stream subscribers.
+
+    One pump task per event loop reads villa_changes past the last seq it
+    has seen, whenever a write calls `notify` (or every poll interval, for
+    writes made by other processes). Each event is encoded once and put on
+    every subscriber's bounded queue. A subscriber whose queue is full is
+    dropped instead of letting it hold up the rest or grow without bound.
+    The pump stops when the last subscriber leaves.
+    """
+
+    def __init__(self, buffer_size, poll_interval):
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.last_seq = 0
+        self.published = 0
+        self.dropped = 0
+        self._loop = None
+        self._wake = None
+        self._started = None
+        self._task = None
+
+    def notify(self):
+        """Wake the pump; safe to call from any thread."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:  # the loop has been closed
+            pass
+
+    async def subscribe(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._started = loop.create_future()
+            self._task = loop.create_task(self._pump())
+        subscriber = asyncio.Queue(self.buffer_size)
+        self.subscribers.add(subscriber)
+        # Events after last_seq will reach the queue from here on
+        try:
+            await self._started
+        except BaseException:
+            # The pump failed to start; the last one out lets the next retry
+            self.unsubscribe(subscriber)
+            raise
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._loop = self._task = None
+
+    def drop(self, subscriber):
+        self.subscribers.discard(subscriber)
+        while not subscriber.empty():
+            subscriber.get_nowait()
+        subscriber.put_nowait(None)
+        self.dropped += 1
+        logger.warning("Dropped a slow event subscriber at change %s", self.last_seq)
+
+    async def _pump(self):
+        started = self._started
+        try:
+            self.last_seq = await run_in_threadpool(read_latest_change)
+        except asyncio.CancelledError:
+            started.cancel()
+            raise
+        except Exception as e:
+            # Raised by subscribe() instead of leaving it waiting for ever
+            started.set_exception(e)
+            return
+        started.set_result(None)
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                rows = await run_in_threadpool(read_changes_after, self.last_seq)
+            except SQLAlchemyError:
+                logger.exception("Reading villa changes for subscribers failed")
+                continue
+            for row in rows:
+                event = (row.seq, format_event(row))
+                for subscriber in list(self.subscribers):
+                    try:
+                        subscriber.put_nowait(event)
+                    except asyncio.QueueFull:
+                        self.drop(subscriber)
+                self.last_seq = row.seq
+                self.published += 1
+            if len(rows) == MAX_PAGE_SIZE:
+                self._wake.set()  # more changes are waiting
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "lastEventId": self.last_seq,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+villa_events = VillaEventBroker(EVENTS_BUFFER_SIZE, EVENTS_POLL_INTERVAL)
+
+
+async def villa_event_stream(request: Request, last_event_id: Optional[int]):
+    subscriber = await villa_events.subscribe()
+    try:
+        yield b"retry: 3000\n\n"
+        sent = 0
+        if last_event_id is not None:
+            latest = await run_in_threadpool(read_latest_change)
+            if last_event_id > latest:
+                # The id is from another database; start the client over
+                yield b"event: reset\ndata: {}\n\n"
+                last_event_id = 0
+            # Replay what the client missed, then continue with the queue
+            sent = last_event_id
+            while True:
+                rows = await run_in_threadpool(read_changes_after, sent)
+                for row in rows:
+                    yield format_event(row)
+                    sent = row.seq
+                if len(rows) < MAX_PAGE_SIZE:
+                    break
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.get(), EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keep-alive\n\n"
+                continue
+            if event is None:
+                yield b'event: dropped\ndata: {"reason": "slow consumer"}\n\n'
+                break
+            seq, message = event
+            if seq > sent:  # already replayed otherwise
+                yield message
+    finally:
+        villa_events.unsubscribe(subscriber)
+
+
+@app.get("/api/VillaAPI/events")
+async def stream_villa_events(
+    request: Request,
+    last_event_id: Optional[int] = Query(None, ge=0),
+):
+    """Server-sent events for every committed villa create, update and delete.
+
+    Event ids are change feed cursors; browsers resume with the
+    Last-Event-ID header on reconnect, other clients can pass ?last_event_id=.
+    """
+    header = request.headers.get("last-event-id", "")
+    if last_event_id is None and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        villa_event_stream(request, last_event_id),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/VillaAPI/events/stats")
+def get_villa_event_stats():
+    return villa_events.stats()
+
+
+# --- Search ---
+villas_fts = table("villas_fts", column("rowid"))
+
+
+def fts_query(q):
+    """Quote each word so user input is matched literally, never as FTS syntax."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+@app.get("/api/VillaAPI/search", response_model=List[VillaSearchResult])
+def search_villas(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: int = Query(0, ge=0),
+):
+    if not SEARCH_ENABLED:
+        raise HTTPException(status_code=503, detail="Search is not available")
+    match = fts_query(q)
+    if not match:
+        raise HTTPException(status_code=422, detail="Query has no search terms")
+
+    # Name matches weigh more than amenity, amenity more than details.
+    # bm25() is lower for better matches, so ascending order is best first.
+    stmt = (
+        select(
+            VillaORM,
+            literal_column("snippet(villas_fts, -1, '[', ']', '...', 12)"),
+            literal_column("bm25(villas_fts, 10.0, 1.0, 2.0)").label("rank"),
+        )
+        .join_from(villas_fts, VillaORM, VillaORM.id == villas_fts.c.rowid)
+        .where(text("villas_fts MATCH :match").bindparams(match=match))
+        .order_by(text("rank"), VillaORM.id)
+        .offset(cursor)
+        .limit(limit + 1)
+    )
     with SessionLocal() as db:
-        villa = db.query(VillaORM).get(villa_id)
+        rows = db.execute(stmt).all()
+    # The cursor is an offset: relevance order has no stable keyset
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(cursor + limit)
+    logger.info("Search for %r returned %s villas.", q, len(rows))
+    return [
+        {**villa_to_dict(villa), "snippet": snippet, "rank": rank}
+        for villa, snippet, rank in rows
+    ]
+
+
+# --- Bulk Create ---
+def validation_detail(error: ValidationError):
+    return [
+        {"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]}
+        for err in error.errors()
+    ]
+
+
+def parse_bulk_item(item):
+    """Validate one bulk item, returning (row, None) or (None, error detail)."""
+    if not isinstance(item, dict):
+        return None, "Expected a villa object"
+    try:
+        villa = VillaBase(**item)
+    except ValidationError as e:
+        return None, validation_detail(e)
+    row = villa.dict()
+    for field, value in row.items():
+        if isinstance(value, int) and not SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+            message = "Input should fit in a 64-bit signed integer"
+            return None, [{"loc": [field], "msg": message, "type": "int_range"}]
+    return row, None
+
+
+async def read_bulk_items(request: Request):
+    """Yield (row, error) for each item of a JSON array or NDJSON body.
+
+    NDJSON bodies are decoded line by line as they arrive, so a large upload
+    is never held in memory at once.
+    """
+    if NDJSON_MEDIA_TYPE in request.headers.get("content-type", ""):
+        pending = b""
+        async for piece in request.stream():
+            pending += piece
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield decode_ndjson_line(line)
+        if pending.strip():
+            yield decode_ndjson_line(pending)
+        return
+
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array")
+    for item in items:
+        yield parse_bulk_item(item)
+
+
+def decode_ndjson_line(line):
+    try:
+        return parse_bulk_item(json.loads(line))
+    except ValueError:
+        return None, "Invalid JSON"
+
+
+def insert_villa_chunk(rows):
+    """Insert rows in one transaction and return (id, error) for each row.
+
+    If the multi-row INSERT fails, the chunk is retried row by row so only
+    the offending rows are reported as failed.
+    """
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row["createdDate"] = now
+        row["updatedDate"] = now
+
+    table = VillaORM.__table__
+    stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    with SessionLocal() as db:
+        try:
+            ids = db.execute(stmt, rows).scalars().all()
+            db.commit()
+            return [(villa_id, None) for villa_id in ids]
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(
+                "Bulk chunk of %s failed, retrying per row: %s", len(rows), e
+            )
+
+        results = []
+        for row in rows:
+            try:
+                villa_id = db.execute(insert(table).returning(table.c.id), row).scalar()
+                db.commit()
+                results.append((villa_id, None))
+            except SQLAlchemyError as e:
+                db.rollback()
+                results.append((None, str(e.orig if hasattr(e, "orig") else e)))
+        return results
+
+
+@app.post("/api/VillaAPI/bulk", status_code=201)
+async def bulk_create_villas(
+    request: Request,
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1),
+):
+    ids, errors = [], []
+    chunk, positions = [], []
+
+    async def flush():
+        results = await run_in_threadpool(insert_villa_chunk, chunk)
+        for position, (villa_id, error) in zip(positions, results):
+            ids[position] = villa_id
+            if error is not None:
+                errors.append({"index": position, "detail": error})
+        chunk.clear()
+        positions.clear()
+
+    async for row, error in read_bulk_items(request):
+        index = len(ids)
+        ids.append(None)
+        if error is not None:
+            errors.append({"index": index, "detail": error})
+            continue
+        chunk.append(row)
+        positions.append(index)
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+
+    created = len(ids) - len(errors)
+    if created:
+        bump_collection_version()
+    errors.sort(key=lambda e: e["index"])
+    logger.info("Bulk created %s villas, %s failed.", created, len(errors))
+    return FastJSONResponse(
+        status_code=201 if created or not errors else 422,
+        content={
+            "created": created,
+            "failed": len(errors),
+            "ids": ids,
+            "errors": errors,
+        },
+    )
+
+
+# --- Batch ---
+def parse_villa_body(body):
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Expected a villa object")
+    try:
+        return VillaBase(**body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=validation_detail(e))
+
+
+def apply_batch_operation(db, operation: BatchOperation):
+    """Apply one $batch operation to the session and return (status, villa id)."""
+    if operation.op == "create":
+        new_villa = create_villa_row(db, parse_villa_body(operation.body))
+        db.flush()
+        return 201, new_villa.id
+
+    if operation.id is None:
+        raise HTTPException(status_code=422, detail=f"'{operation.op}' needs an id")
+    if operation.op == "update":
+        update_villa_row(db, operation.id, parse_villa_body(operation.body))
+    elif operation.op == "patch":
+        if not isinstance(operation.body, list) or not all(
+            isinstance(update, dict) for update in operation.body
+        ):
+            raise HTTPException(
+                status_code=422, detail="Expected a list of patch operations"
+            )
+        patch_villa_row(db, operation.id, operation.body)
+    else:
+        delete_villa_row(db, operation.id)
+    # Flush per operation so a database error is reported against its cause
+    db.flush()
+    return 204, operation.id
+
+
+@app.post("/api/VillaAPI/$batch")
+def batch_villas(batch: BatchRequest):
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch",
+        )
+
+    results = [
+        {
+            "index": index,
+            "op": operation.op,
+            "id": operation.id,
+            "status": 424,
+            "detail": "Not run",
+        }
+        for index, operation in enumerate(batch.operations)
+    ]
+    failed = aborted = False
+    touched = set()
+    with SessionLocal() as db:
+        for index, operation in enumerate(batch.operations):
+            result = results[index]
+            try:
+                result["status"], result["id"] = apply_batch_operation(db, operation)
+                del result["detail"]
+                touched.add(result["id"])
+            except HTTPException as e:
+                result["status"], result["detail"] = e.status_code, e.detail
+                failed = True
+            except SQLAlchemyError as e:
+                # The session is unusable after a failed flush, nothing can
+                # be committed any more.
+                result["status"], result["detail"] = 500, str(
+                    getattr(e, "orig", None) or e
+                )
+                aborted = True
+            except Exception as e:
+                # Anything else (e.g. a value the driver can't bind) leaves
+                # the session in an unknown state too, so abort the same way.
+                logger.exception("Batch operation %s failed", index)
+                result["status"], result["detail"] = 500, str(e)
+                aborted = True
+            if aborted or (failed and batch.atomic):
+                break
+
+        committed = not aborted and not (failed and batch.atomic)
+        if committed:
+            db.commit()
+        else:
+            db.rollback()
+
+    if committed:
+        for villa_id in touched:
+            villa_cache.invalidate(villa_id)
+        if touched:
+            bump_collection_version()
+    else:
+        for result in results:
+            if result["status"] in (201, 204):
+                result["status"] = 424
+                result["detail"] = "Rolled back"
+    logger.info(
+        "Batch of %s operations %s, %s applied.",
+        len(results),
+        "committed" if committed else "rolled back",
+        sum(r["status"] in (201, 204) for r in results),
+    )
+    return {"committed": committed, "results": results}
+
+
+# --- Async API Routes (VILLA_DB_MODE=async) ---
+# Same contract as the routes above, but running on the event loop through
+# aiosqlite instead of taking a threadpool slot per request.
+async_villa_router = APIRouter(default_response_class=FastJSONResponse)
+
+
+@async_villa_router.get("/api/VillaAPI", response_model=List[Villa])
+async def get_all_villas_async(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    query: VillaListQuery = Depends(),
+    fields: Optional[tuple] = Depends(parse_fields),
+    stream: bool = False,
+):
+    if fields is None and FAST_JSON:
+        fields = VILLA_FIELDS
+
+    # Taken before reading so a write racing this request changes the tag
+    version = await run_in_threadpool(collection_version.get)
+    etag = collection_etag(request, version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    if wants_stream(request, stream):
+        return StreamingResponse(
+            stream_villas_async(limit, query, fields),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag},
+        )
+
+    if uses_snapshot(limit, query, fields):
+        snapshot = await run_in_threadpool(villa_snapshot.get, version)
+        if snapshot is not None:
+            return snapshot_response(request, snapshot, etag)
+
+    async with AsyncSessionLocal() as db:
+        await plan_villa_list_async(db, query)
+        stmt = villa_list_statement(page_limit(limit), query, fields)
+        result = await db.execute(stmt)
+        rows = result.scalars().all() if fields is None else result.all()
+        villas = trim_page(rows, limit, query, response)
+        response.headers["ETag"] = etag
+        logger.info("Retrieved %s villas.", len(villas))
+        if fields is not None:
+            return column_list_response(villas, fields, response)
+        return villas
+
+
+@async_villa_router.get("/api/VillaAPI/{villa_id}", response_model=Villa)
+async def get_villa_async(
+    request: Request,
+    response: Response,
+    villa_id: int = Path(...),
+    fields: Optional[tuple] = Depends(parse_fields),
+):
+    cached = villa_cache.get(villa_id)
+    if cached is not None:
+        logger.info("Retrieved villa with ID %s (cached)", villa_id)
+        return villa_response(request, response, cached, fields)
+
+    if fields is not None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(villa_item_statement(villa_id, fields))
+            row = result.first()
+        if row is None:
+            logger.warning("Villa with ID %s not found.", villa_id)
+            raise HTTPException(status_code=404, detail="Villa not found")
+        logger.info("Retrieved villa with ID %s", villa_id)
+        data = villa_to_dict(row, fields + ("updatedDate",))
+        return villa_response(request, response, data, fields)
+
+    version = villa_cache.version
+    async with AsyncSessionLocal() as db:
+        villa = await db.get(VillaORM, villa_id)
         if not villa:
-            logger.warning(f"Delete failed. Villa with ID {villa_id} not found.")
+            logger.warning("Villa with ID %s not found.", villa_id)
             raise HTTPException(status_code=404, detail="Villa not found")
-        db.delete(villa)
-        db.commit()
-        logger.info(f"Deleted villa with ID {villa_id}")
+        logger.info("Retrieved villa with ID %s", villa_id)
+        data = villa_to_dict(villa)
+    villa_cache.put(villa_id, data, version)
+    return villa_response(request, response, data)
+
+
+@async_villa_router.post("/api/VillaAPI", status_code=201)
+async def create_villa_async(villa: VillaBase):
+    if WRITE_QUEUE_ENABLED:
+        await asyncio.wrap_future(villa_writes.submit(create_villa_row, villa))
+    else:
+        async with AsyncSessionLocal() as db:
+            create_villa_row(db, villa)
+            await db.commit()
+    bump_collection_version()
+    logger.info("Created villa: %s", villa.name)
+    return {"message": "Villa created successfully"}
+
+
+@async_villa_router.put("/api/VillaAPI/{villa_id}", status_code=204)
+async def update_villa_async(villa_id: int, villa: VillaBase):
+    if WRITE_QUEUE_ENABLED:
+        write = villa_writes.submit(update_villa_row, villa_id, villa)
+        await asyncio.wrap_future(write)
+    else:
+        async with AsyncSessionLocal() as db:
+            statement = villa_update_statement(villa_id, villa_put_values(villa))
+            result = await db.execute(statement)
+            require_villa(result.rowcount, villa_id, "Update")
+            await db.commit()
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Updated villa ID %s", villa_id)
+
+
+@async_villa_router.patch("/api/VillaAPI/{villa_id}", status_code=204)
+async def patch_villa_async(villa_id: int, updates: List[dict]):
+    if WRITE_QUEUE_ENABLED:
+        write = villa_writes.submit(patch_villa_row, villa_id, updates)
+        await asyncio.wrap_future(write)
+    else:
+        async with AsyncSessionLocal() as db:
+            values, guards = compile_villa_patch(updates)
+            statement = villa_patch_statement(villa_id, values, guards)
+            result = await db.execute(statement)
+            if not result.rowcount:
+                exists = guards and (
+                    (await db.execute(villa_exists_statement(villa_id))).first()
+                )
+                reject_villa_patch(villa_id, exists)
+            log_patched_fields(villa_id, values)
+            await db.commit()
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Completed patch for villa ID %s", villa_id)
+
+
+@async_villa_router.delete("/api/VillaAPI/{villa_id}", status_code=204)
+async def delete_villa_async(villa_id: int):
+    if WRITE_QUEUE_ENABLED:
+        await asyncio.wrap_future(villa_writes.submit(delete_villa_row, villa_id))
+    else:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(villa_delete_statement(villa_id))
+            require_villa(result.rowcount, villa_id, "Delete")
+            await db.commit()
+    villa_cache.invalidate(villa_id)
+    bump_collection_version()
+    logger.info("Deleted villa with ID %s", villa_id)
+
+
+# --- Lifecycle ---
+# Warm the connection pool and caches on startup; 0 starts cold
+WARMUP_ENABLED = os.getenv("VILLA_WARMUP", "1") == "1"
+# Seconds between checks of a serve.py worker for its siblings' writes
+WORKER_SYNC_INTERVAL = float(os.getenv("VILLA_WORKER_SYNC_INTERVAL", "0.5"))
+# Lower bound of an encoded villa's size, to skip building a snapshot at
+# startup that could not fit the budget anyway
+SNAPSHOT_MIN_ROW_BYTES = 200
+
+# Set once warm-up is done, cleared on shutdown; see /health/ready
+ready = threading.Event()
+
+
+def warm_up():
+    """Open the pool's connections and fill the caches before serving.
+
+    Runs before the server accepts its first request, so that cost isn't
+    paid by early requests: connections with their PRAGMAs applied, the
+    full-list snapshot and the single-villa cache with the newest villas.
+    """
+    started = time.perf_counter()
+    pool_size = getattr(engine.pool, "size", lambda: 1)()
+    connections = [engine.connect() for _ in range(pool_size)]
+    for conn in connections:
+        conn.exec_driver_sql("SELECT 1")
+        conn.close()
+
+    with SessionLocal() as db:
+        count = db.execute(select(func.count()).select_from(VillaORM)).scalar()
+        if 0 < count * SNAPSHOT_MIN_ROW_BYTES <= SNAPSHOT_MAX_BYTES:
+            villa_snapshot.get(collection_version.get())
+        version = villa_cache.version
+        newest = db.query(VillaORM).order_by(VillaORM.id.desc()).limit(VILLA_CACHE_SIZE)
+        for villa in newest:
+            villa_cache.put(villa.id, villa_to_dict(villa), version)
+    logger.info(
+        "Warmed up %s connections and the caches in %.2fs",
+        pool_size,
+        time.perf_counter() - started,
+    )
+
+
+async def warm_up_async_pool():
+    pool_size = getattr(async_engine.pool, "size", lambda: 1)()
+    connections = [await async_engine.connect() for _ in range(pool_size)]
+    for conn in connections:
+        await conn.exec_driver_sql("SELECT 1")
+        await conn.close()
+
+
+class WorkerSync:
+    """Applies writes made by sibling serve.py workers to this one's cache.
+
+    List ETags and the list snapshot follow the change feed's seq, which all
+    workers share, but every worker has its own single-villa cache. This
+    thread follows villa_changes, invalidates the villas other workers
+    changed and wakes this worker's event streams. A worker's own writes
+    come back through it too, which is harmless.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="worker-sync", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        last_seq = read_latest_change()
+        while True:
+            time.sleep(self.interval)
+            try:
+                with SessionLocal() as db:
+                    changes = db.execute(
+                        select(villa_changes.c.seq, villa_changes.c.villa_id)
+                        .where(villa_changes.c.seq > last_seq)
+                        .order_by(villa_changes.c.seq)
+                    ).all()
+            except SQLAlchemyError as e:
+                logger.warning("Reading villa changes failed: %s", e)
+                continue
+            if not changes:
+                continue
+            for change in changes:
+                villa_cache.invalidate(change.villa_id)
+            last_seq = changes[-1].seq
+            villa_events.notify()
+
+
+worker_sync = WorkerSync(WORKER_SYNC_INTERVAL)
+
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    """The event loop is responsive; restart the process if this fails."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def readiness():
+    """Warmed up and able to query the database; route traffic here if 200."""
+    if not ready.is_set():
+        return FastJSONResponse({"status": "starting"}, status_code=503)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    except SQLAlchemyError as e:
+        logger.warning("Readiness check failed: %s", e)
+        return FastJSONResponse({"status": "unavailable"}, status_code=503)
+    return {"status": "ready", "worker": WORKER_ID}
+
+
+# Routers are included last so that fixed paths registered directly on `app`
+# (e.g. /api/VillaAPI/bulk) take precedence over /api/VillaAPI/{villa_id}.
+app.include_router(async_villa_router if DB_MODE == "async" else villa_router)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MagicVilla API maintenance")
+    parser.add_argument("command", choices=["rebuild-search"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild-search":
+        rebuild_search_index()
@@ -0,0 +1,210 @@
+"""
+Run the VillaAPI in production: main:app in several worker processes.
+
+    python serve.py --workers 4 --port 7155
+
+The launcher imports main once, which creates or upgrades the schema, then
+binds the port and starts the workers with that socket. The kernel spreads
+incoming connections over them. Each worker warms its connection pool and
+caches before it takes its first request; /health/ready answers 200 from
+then on and /health/live whenever the worker's event loop is responsive.
+
+Workers send their log records to the launcher, which alone writes the
+rotating logs/ file. The launcher also runs the SQLite checkpoints and
+restarts workers that die. uvloop and httptools are used when installed.
+Settings are the same VILLA_* variables as for `uvicorn main:app`.
+"""
+
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# A worker that exits this soon after starting is failing, not crashing
+MIN_WORKER_UPTIME = 5.0
+
+logger = logging.getLogger("serve")
+
+
+def queue_handler(log_queue):
+    """Handler sending records to the launcher's log listener."""
+    handler = QueueHandler(log_queue)
+    # Merges args and traceback into the message; the listener adds the rest
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def event_loop_and_http():
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def exit_worker(signum, frame):
+    # Already on the way out; a further stop signal would kill the process
+    # while it flushes its last log records
+    for other in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(other, signal.SIG_IGN)
+    sys.exit(0)
+
+
+def run_worker(worker_id, sock, log_queue, args):
+    """Entry point of a worker process."""
+    os.environ["VILLA_WORKER_ID"] = str(worker_id)
+    # uvicorn re-raises the stop signal once it has shut down. Exit normally
+    # then (Ctrl+C reaches the workers too), which flushes the log queue
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, exit_worker)
+    # Before main is imported, so it leaves the log file to the launcher
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler(log_queue)])
+
+    import uvicorn
+
+    loop, http = event_loop_and_http()
+    config = uvicorn.Config(
+        "main:app",
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=args.access_log,
+        log_config=None,  # uvicorn's records go to the root logger as well
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Starts the workers, restarts the ones that die and stops them all."""
+
+    def __init__(self, args, sock, log_queue):
+        self.args = args
+        self.sock = sock
+        self.log_queue = log_queue
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+        self.stopping = False
+
+    def start_worker(self, worker_id):
+        process = self.context.Process(
+            target=run_worker,
+            args=(worker_id, self.sock, self.log_queue, self.args),
+            name=f"villa-worker-{worker_id}",
+        )
+        process.start()
+        self.workers[worker_id] = (process, time.monotonic())
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def run(self):
+        for worker_id in range(1, self.args.workers + 1):
+            self.start_worker(worker_id)
+        while not self.stopping:
+            time.sleep(0.5)
+            for worker_id, (process, started) in list(self.workers.items()):
+                if process.is_alive() or self.stopping:
+                    continue
+                if time.monotonic() - started < MIN_WORKER_UPTIME:
+                    logger.error(
+                        "Worker %s failed to start (exit code %s), shutting down",
+                        worker_id,
+                        process.exitcode,
+                    )
+                    return self.shutdown(1)
+                logger.warning(
+                    "Worker %s exited with code %s, restarting",
+                    worker_id,
+                    process.exitcode,
+                )
+                self.start_worker(worker_id)
+        return self.shutdown(0)
+
+    def shutdown(self, exit_code):
+        logger.info("Stopping %s workers", len(self.workers))
+        for process, _ in self.workers.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: uvicorn finishes open requests
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        for process, _ in self.workers.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.strip().splitlines()[1:]),
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7155)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--keep-alive", type=int, default=5, help="idle keep-alive timeout (s)"
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=10,
+        help="seconds open requests and event streams get on shutdown",
+    )
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    log_queue = context.Queue()
+    # The launcher's own records take the same path as the workers'
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler(log_queue)])
+
+    import main as api  # creates or upgrades the schema, once
+
+    listener = QueueListener(log_queue, *api.log_handlers(), respect_handler_level=True)
+    listener.start()
+    try:
+        sock = bind_socket(args.host, args.port, args.backlog)
+        supervisor = Supervisor(args, sock, log_queue)
+        signal.signal(signal.SIGINT, supervisor.stop)
+        signal.signal(signal.SIGTERM, supervisor.stop)
+        loop, http = event_loop_and_http()
+        logger.info(
+            "Serving on http://%s:%s with %s workers (%s, %s)",
+            args.host,
+            args.port,
+            args.workers,
+            loop,
+            http,
+        )
+        exit_code = supervisor.run()
+    finally:
+        listener.stop()
+    raise SystemExit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Shared fixtures: main.py imported against a seeded database."""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "benchmarks")]
+
+ROWS = 20000
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """A seeded database file, with main imported against it."""
+    workdir = tmp_path_factory.mktemp("villas")
+    db_path = str(workdir / "villas.db")
+    previous_dir, previous_url = os.getcwd(), os.environ.get("VILLA_DATABASE_URL")
+    os.chdir(workdir)  # main.py creates logs/ in its working directory
+    os.environ["VILLA_DATABASE_URL"] = f"sqlite:///{db_path}"
+    try:
+        # Creates the schema in a fresh process, loads the rows and runs
+        # ANALYZE, which production databases have had too
+        importlib.import_module("generate").generate(db_path, ROWS, search_index=False)
+        main = importlib.import_module("main")
+    finally:
+        os.chdir(previous_dir)
+        if previous_url is None:
+            os.environ.pop("VILLA_DATABASE_URL")
+        else:
+            os.environ["VILLA_DATABASE_URL"] = previous_url
+    return main, db_path
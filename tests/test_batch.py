@@ -0,0 +1,34 @@
+"""
+Failure handling of POST /api/VillaAPI/$batch.
+"""
+
+from fastapi.testclient import TestClient
+
+VILLA = {
+    "name": "Villa",
+    "details": "",
+    "rate": 100,
+    "sqft": 100,
+    "occupancy": 2,
+    "imageUrl": "",
+    "amenity": "",
+}
+
+
+def test_unexpected_error_rolls_the_batch_back(database):
+    main, _ = database
+    # Passes validation, but the driver can't bind an int beyond 64 bits
+    operations = [
+        {"op": "create", "body": VILLA},
+        {"op": "create", "body": {**VILLA, "sqft": 10**30}},
+        {"op": "create", "body": VILLA},
+    ]
+    response = TestClient(main.app).post(
+        "/api/VillaAPI/$batch", json={"operations": operations, "atomic": False}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is False
+    assert [r["status"] for r in body["results"]] == [424, 500, 424]
+    assert body["results"][0]["detail"] == "Rolled back"
+    assert body["results"][2]["detail"] == "Not run"
@@ -0,0 +1,36 @@
+"""
+Per-item errors of POST /api/VillaAPI/bulk.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+VILLA = {
+    "name": "Villa",
+    "details": "",
+    "rate": 100,
+    "sqft": 100,
+    "occupancy": 2,
+    "imageUrl": "",
+    "amenity": "",
+}
+
+
+@pytest.mark.parametrize("field", ["sqft", "occupancy"])
+@pytest.mark.parametrize("value", [2**63, -(2**63) - 1, 10**30])
+def test_int_beyond_64_bits_is_an_item_error(database, field, value):
+    main, _ = database
+    response = TestClient(main.app).post(
+        "/api/VillaAPI/bulk", json=[{**VILLA, field: value}]
+    )
+    assert response.status_code == 422
+    body = response.json()
+    assert body["created"] == 0
+    assert body["errors"][0]["index"] == 0
+    assert body["errors"][0]["detail"][0]["loc"] == [field]
+
+
+def test_int_at_the_64_bit_limit_is_accepted(database):
+    main, _ = database
+    for value in (2**63 - 1, -(2**63)):
+        assert main.parse_bulk_item({**VILLA, "sqft": value})[1] is None
@@ -0,0 +1,39 @@
+"""
+ETags of compressed responses and of the 304s that revalidate them.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+PAGE = "/api/VillaAPI?limit=50"
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,encoding", [("gzip", "gzip"), ("gzip, br", "br")]
+)
+def test_304_carries_the_compressed_tag(database, accept_encoding, encoding):
+    main, _ = database
+    if encoding == "br" and main.brotli is None:
+        pytest.skip("brotli is not installed")
+    client = TestClient(main.app)
+    headers = {"Accept-Encoding": accept_encoding}
+    response = client.get(PAGE, headers=headers)
+    assert response.headers["Content-Encoding"] == encoding
+    etag = response.headers["ETag"]
+    assert etag.endswith(f'-{encoding}"')
+
+    revalidated = client.get(PAGE, headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert "Accept-Encoding" in revalidated.headers["Vary"]
+
+
+def test_304_keeps_the_encoding_the_client_has(database):
+    main, _ = database
+    client = TestClient(main.app)
+    etag = client.get(PAGE, headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    # Cached as gzip, now also offering br
+    headers = {"Accept-Encoding": "gzip, br", "If-None-Match": etag}
+    revalidated = client.get(PAGE, headers=headers)
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
@@ -0,0 +1,31 @@
+"""
+Subscriptions to the villa event broker behind GET /api/VillaAPI/events.
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+def test_subscribe_fails_instead_of_hanging_when_the_pump_fails(database, monkeypatch):
+    main, _ = database
+    broker = main.VillaEventBroker(buffer_size=4, poll_interval=60)
+
+    def locked():
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("locked"))
+
+    async def subscribe_twice():
+        monkeypatch.setattr(main, "read_latest_change", locked)
+        with pytest.raises(OperationalError):
+            await asyncio.wait_for(broker.subscribe(), 5)
+        assert not broker.subscribers
+
+        # The next subscriber starts a new pump
+        monkeypatch.setattr(main, "read_latest_change", lambda: 7)
+        subscriber = await asyncio.wait_for(broker.subscribe(), 5)
+        assert broker.last_seq == 7
+        broker.unsubscribe(subscriber)
+
+    asyncio.run(subscribe_twice())
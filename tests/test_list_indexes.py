@@ -0,0 +1,168 @@
+"""
+Every filter and sort of GET /api/VillaAPI is answered through an index.
+
+Builds the list endpoint's SELECT for each case against a seeded, ANALYZEd
+database and checks SQLite's EXPLAIN QUERY PLAN. Selective filters must seek
+their index instead of scanning the table, broad filters and sorts must read
+the sort order's index instead of sorting every match in a temporary B-tree.
+"""
+
+import base64
+import json
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+PAGE_SIZE = 50
+
+SORTS = ["id", "-id", "name", "-createdDate"]
+# Filters matching a few percent of the villas at most, and the indexes
+# either of which the plan must seek
+SELECTIVE_FILTERS = [
+    ({"rate_min": 900}, {"ix_villas_rate"}),
+    ({"rate_max": 60}, {"ix_villas_rate"}),
+    ({"occupancy_min": 10}, {"ix_villas_occupancy"}),
+    ({"occupancy_min": 6, "rate_max": 100}, {"ix_villas_occupancy", "ix_villas_rate"}),
+    ({"sqft_min": 5000}, {"ix_villas_sqft"}),
+    ({"sqft_max": 400}, {"ix_villas_sqft"}),
+    ({"sqft_min": 1000, "sqft_max": 1200}, {"ix_villas_sqft"}),
+    ({"sqft_min": 1000, "rate_min": 500}, {"ix_villas_sqft", "ix_villas_rate"}),
+    ({"name_prefix": "Azure Bay"}, {"ix_villas_name"}),
+]
+# Filters matching (nearly) every villa
+BROAD_FILTERS = [
+    {"rate_min": 10},
+    {"occupancy_min": 2},
+    {"sqft_min": 150},
+    {"rate_min": 100, "rate_max": 1000},
+    {"sqft_min": 500, "sqft_max": 10000},
+    {"occupancy_min": 2, "rate_min": 50},
+]
+
+
+def list_query(main, sort="id", **filters):
+    # Called directly, so every parameter needs a value instead of Query()
+    params = dict.fromkeys(
+        (
+            "after_id",
+            "cursor",
+            "rate_min",
+            "rate_max",
+            "occupancy_min",
+            "sqft_min",
+            "sqft_max",
+            "name_prefix",
+        )
+    )
+    params.update(filters)
+    return main.VillaListQuery(sort=sort, **params)
+
+
+def query_plan(database, sort="id", **filters):
+    """The planned query and the detail lines of SQLite's plan for it."""
+    main, db_path = database
+    query = list_query(main, sort, **filters)
+    with main.SessionLocal() as db:
+        main.plan_villa_list(db, query)
+    stmt = main.villa_list_statement(main.page_limit(PAGE_SIZE), query)
+    compiled = stmt.compile(main.engine)
+    params = compiled.construct_params()
+    args = [params[name] for name in compiled.positiontup]
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {compiled.string}", args)
+        return query, [row[3] for row in rows]
+
+
+def seeks(plan, indexes):
+    return any(
+        line.startswith("SEARCH villas USING")
+        and line.split(" (")[0].split()[-1] in indexes
+        for line in plan
+    )
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("filters,indexes", SELECTIVE_FILTERS)
+def test_selective_filter_seeks_its_index(database, filters, indexes, sort):
+    query, plan = query_plan(database, sort, **filters)
+    if query.sort_key in query.filtered:
+        # The sort column's own index seeks and orders at once
+        assert query.seek is None
+    else:
+        # So a temp B-tree sorts at most FILTER_SEEK_MAX_ROWS villas
+        assert query.seek is True
+    assert seeks(plan, indexes), plan
+    assert not any(line.startswith("SCAN villas") for line in plan), plan
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("filters", BROAD_FILTERS)
+def test_broad_filter_walks_the_sort_order(database, filters, sort):
+    query, plan = query_plan(database, sort, **filters)
+    assert query.seek is False
+    assert not any("TEMP B-TREE" in line for line in plan), plan
+    if query.sort_key != "id":
+        index = f"ix_villas_{query.sort_key}"
+        assert any(f"USING INDEX {index}" in line for line in plan), plan
+
+
+def test_selective_filter_seeks_its_index_past_a_cursor(database):
+    cursor = base64.urlsafe_b64encode(json.dumps(["Golden Cove", 7]).encode())
+    _, plan = query_plan(database, "name", rate_min=900, cursor=cursor.decode())
+    assert seeks(plan, {"ix_villas_rate"}), plan
+
+
+@pytest.mark.parametrize("sort", ["rate", "-rate"])
+@pytest.mark.parametrize("rate_min", [10, 900])
+def test_filter_on_the_sort_column_needs_no_sort(database, sort, rate_min):
+    query, plan = query_plan(database, sort, rate_min=rate_min)
+    assert query.seek is None
+    assert any("USING INDEX ix_villas_rate" in line for line in plan), plan
+    assert not any("TEMP B-TREE" in line for line in plan), plan
+
+
+def test_name_prefix_matches_every_following_character(database):
+    main, _ = database
+    names = ["Villa", "Villa x", "Villa\uffff x", "Villa\U0001f600 x"]
+    query = list_query(main, name_prefix="Villa")
+    with main.SessionLocal() as db:
+        for name in names + ["Vill", "Villb"]:
+            db.add(
+                main.VillaORM(
+                    name=name,
+                    details="",
+                    rate=100,
+                    sqft=100,
+                    occupancy=1,
+                    imageUrl="",
+                    amenity="",
+                )
+            )
+        db.flush()
+        stmt = main.select(main.VillaORM.name).where(*query.conditions)
+        assert sorted(db.scalars(stmt)) == sorted(names)
+        db.rollback()
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize(
+    "sort_key", ["id", "name", "rate", "sqft", "occupancy", "createdDate"]
+)
+def test_sort_reads_an_index_in_order(database, sort_key, descending):
+    main, _ = database
+    assert sort_key in main.SORT_KEYS
+    _, plan = query_plan(database, ("-" if descending else "") + sort_key)
+    assert not any("TEMP B-TREE" in line for line in plan), plan
+    if sort_key != "id":  # the table itself is in id order
+        assert any(f"USING INDEX ix_villas_{sort_key}" in line for line in plan), plan
+
+
+@pytest.mark.parametrize(
+    "sort", ["details", "amenity", "imageUrl", "updatedDate", "-details", "price"]
+)
+def test_sort_without_an_index_is_rejected(database, sort):
+    main, _ = database
+    with pytest.raises(HTTPException) as excinfo:
+        list_query(main, sort)
+    assert excinfo.value.status_code == 422
@@ -0,0 +1,25 @@
+"""
+Validation of JSON Patch documents for PATCH /api/VillaAPI/{id}.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+
+@pytest.mark.parametrize("value", [2**63, -(2**63) - 1, 10**30, 1e30, "1e30"])
+@pytest.mark.parametrize("op", ["replace", "test"])
+def test_int_beyond_64_bits_is_rejected(database, op, value):
+    main, _ = database
+    document = [{"op": op, "path": "/sqft", "value": value}]
+    with pytest.raises(HTTPException) as excinfo:
+        main.compile_villa_patch(document)
+    assert excinfo.value.status_code == 422
+    assert "64-bit" in excinfo.value.detail
+
+
+@pytest.mark.parametrize("value", [2**63 - 1, -(2**63)])
+def test_int_at_the_64_bit_limit_is_accepted(database, value):
+    main, _ = database
+    document = [{"op": "replace", "path": "/occupancy", "value": value}]
+    values, _ = main.compile_villa_patch(document)
+    assert values["occupancy"] == value
@@ -0,0 +1,40 @@
+"""
+SQL metrics of instrument_engine, including for failures outside a statement.
+"""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+
+def error_count(main, engine_name, kind):
+    series = f'villa_sql_errors_total{{engine="{engine_name}",error="{kind}"}} '
+    for line in main.metrics.render().splitlines():
+        if line.startswith(series):
+            return int(line[len(series) :])
+    return 0
+
+
+def test_locked_commit_is_counted(database, tmp_path):
+    main, _ = database
+    db_path = str(tmp_path / "locked.db")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"timeout": 0})
+    main.instrument_engine(engine, "locked")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    # A reader's SHARED lock lets the INSERT run but blocks its COMMIT
+    reader = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM t").fetchall()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+            with pytest.raises(OperationalError, match="database is locked"):
+                conn.commit()
+            assert not conn.info.get("query_start")
+    finally:
+        reader.close()
+        engine.dispose()
+    assert error_count(main, "locked", "database_locked") == 1